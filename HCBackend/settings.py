@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'HCUser',
     'HCProduct',
     'HCCart',
@@ -118,6 +119,45 @@ CACHES = {
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
 
+# Catalog response cache. Entries are keyed on a catalog version that is bumped
+# on every catalog write, so the timeout only bounds how long unused pages linger.
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=60 * 60, cast=int)
+
+# Categories are cached whole in each worker and dropped via Redis pub/sub; the
+# version key is re-checked this often (seconds) in case a message was missed
+CATEGORY_CACHE_RECHECK = config('CATEGORY_CACHE_RECHECK', default=60, cast=int)
+
+# Unfiltered product totals above this many rows use the Postgres planner
+# estimate instead of COUNT(*). Set to 0 to always count exactly.
+CATALOG_COUNT_ESTIMATE_THRESHOLD = config('CATALOG_COUNT_ESTIMATE_THRESHOLD', default=100_000, cast=int)
+
+# Text search configuration used for product search vectors and queries
+PRODUCT_SEARCH_CONFIG = config('PRODUCT_SEARCH_CONFIG', default='english')
+
+# How long unsigned image URLs stay cached. Signed URLs are cached for half of
+# AWS_QUERYSTRING_EXPIRE instead, so clients always get at least half their lifetime.
+IMAGE_URL_CACHE_TIMEOUT = config('IMAGE_URL_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# Resized WebP/JPEG (and AVIF, when Pillow supports it) renditions generated
+# for uploaded product and category images, off the request thread
+IMAGE_RENDITION_WIDTHS = config('IMAGE_RENDITION_WIDTHS', default='200,400,800', cast=Csv(int))
+IMAGE_RENDITION_WORKERS = config('IMAGE_RENDITION_WORKERS', default=2, cast=int)
+
+# Direct-to-S3 image uploads: lifetime of the presigned POST and the largest accepted file
+IMAGE_UPLOAD_URL_EXPIRE = config('IMAGE_UPLOAD_URL_EXPIRE', default=60 * 10, cast=int)
+IMAGE_UPLOAD_MAX_BYTES = config('IMAGE_UPLOAD_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+
+# Seconds a coupon lookup (including "no such code") stays cached in Redis
+COUPON_CACHE_TIMEOUT = config('COUPON_CACHE_TIMEOUT', default=60, cast=int)
+
+# Live carts are Redis hashes written back to Postgres by `manage.py flush_carts`;
+# an untouched cart drops out of Redis after this many seconds (reloaded on use)
+CART_STORE_TTL = config('CART_STORE_TTL', default=60 * 60 * 24 * 7, cast=int)
+
+# Guest carts live only in Redis, keyed by a token kept in the (cache-backed)
+# session, and expire this many seconds after their last change
+GUEST_CART_TTL = config('GUEST_CART_TTL', default=60 * 60 * 24 * 7, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
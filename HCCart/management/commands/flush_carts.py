@@ -0,0 +1,49 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from HCCart.utils.store import flush_dirty
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Write live Redis carts back to Cart/CartItem in batches. Run it with "
+        "--loop as a long-running process next to the web workers; checkout "
+        "flushes the buyer's cart itself."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running instead of flushing once")
+        parser.add_argument("--interval", type=float, default=2, help="Seconds between rounds (default 2)")
+        parser.add_argument("--batch-size", type=int, default=200, help="Carts written per transaction (default 200)")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be >= 1")
+
+        while True:
+            flushed = 0
+            try:
+                # Drain the backlog before sleeping; carts that fail are logged
+                # by flush_dirty and stay dirty for the next round
+                while True:
+                    written = flush_dirty(batch_size)
+                    flushed += written
+                    if written < batch_size:
+                        break
+            except Exception:
+                # Redis or Postgres unavailable: keep the worker alive
+                if not options["loop"]:
+                    raise
+                logger.exception("Cart flush round failed; retrying in %ss", options["interval"])
+            if flushed or options["verbosity"] > 1:
+                self.stdout.write(f"Flushed {flushed} carts")
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-18 02:39
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    CartItem = apps.get_model("HCCart", "CartItem")
+    duplicates = (
+        CartItem.objects.values("cart_id", "product_id", "variant_id")
+        .annotate(rows=Count("id"), total=Sum("quantity"), keep=Min("id"))
+        .filter(rows__gt=1)
+    )
+    for line in duplicates:
+        # Keep the oldest row with the summed quantity
+        CartItem.objects.filter(pk=line["keep"]).update(quantity=line["total"])
+        CartItem.objects.filter(
+            cart_id=line["cart_id"],
+            product_id=line["product_id"],
+            variant_id=line["variant_id"],
+        ).exclude(pk=line["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("HCCart", "0002_checkoutsession"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        # Partial indexes rather than nulls_distinct=False, which needs PostgreSQL 15
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("variant__isnull", True)),
+                fields=("cart", "product"),
+                name="cartitem_cart_product_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("variant__isnull", False)),
+                fields=("cart", "variant"),
+                name="cartitem_cart_variant_uniq",
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from HCUser.models import HomeChoiceUser
 from HCProduct.models import Product, ProductVariant
 
@@ -13,9 +14,12 @@ class Cart(models.Model):
 
     def total_price(self):
         """
-        Calculates total price of all cart items.
+        Calculates total price of all cart items in one query.
         """
-        return sum(item.total_item_price() for item in self.items.all())
+        # Imported here: the helper module imports these models
+        from HCCart.utils.totals import cart_total
+
+        return cart_total(self)
 
 
 class CartItem(models.Model):
@@ -25,6 +29,18 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # One row per line, as partial unique indexes (any PostgreSQL) that
+            # adds upsert against with ON CONFLICT (see utils/store.py)
+            models.UniqueConstraint(
+                fields=["cart", "product"], condition=Q(variant__isnull=True), name="cartitem_cart_product_uniq"
+            ),
+            models.UniqueConstraint(
+                fields=["cart", "variant"], condition=Q(variant__isnull=False), name="cartitem_cart_variant_uniq"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.product_name if self.product else self.variant.product_variant_name}"
 
@@ -32,8 +48,10 @@ class CartItem(models.Model):
         """
         Calculates total price for this item.
         """
-        price = self.variant.product_variant_price if self.variant else self.product.product_price
-        return self.quantity * price
+        # Imported here: the helper module imports these models
+        from HCCart.utils.totals import unit_price
+
+        return self.quantity * (unit_price(self) or 0)
 class CheckoutSession(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -53,3 +71,18 @@ class CheckoutSession(models.Model):
 
     def __str__(self):
         return f"Checkout {self.reference} ({self.status}) for {self.user.email}"
+
+
+# Move an anonymous session's guest cart into the user's cart on login
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+
+@receiver(user_logged_in)
+def merge_guest_cart(sender, request, user, **kwargs):
+    # Imported here: the helper modules import these models
+    from HCCart.utils.guest import GUEST_CART_SESSION_KEY, merge_into_user
+
+    token = request.session.pop(GUEST_CART_SESSION_KEY, None) if request is not None else None
+    if token:
+        merge_into_user(token, user.id)
@@ -8,6 +8,17 @@ class CartItemSchema(Schema):
     quantity: int
 
 
+class CartBatchOperationSchema(Schema):
+    op: str  # "set", "add" or "remove"
+    product_id: Optional[int] = None  # Either product_id or variant_id is required
+    variant_id: Optional[int] = None
+    quantity: Optional[int] = None  # Required for set / add
+
+
+class CartBatchSchema(Schema):
+    operations: list[CartBatchOperationSchema]
+
+
 class CartSchema(Schema):
     user_id: int
     items: list[CartItemSchema]
@@ -1,3 +1,214 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+
+from HCCart.models import Cart, CartItem
+from HCCart.utils import guest, store
+from HCProduct.models import Product, ProductVariant
+from HCUser.models import HomeChoiceUser
+
+
+class CartTestCase(TestCase):
+    def setUp(self):
+        # Live carts are Redis hashes; start every test from an empty store
+        caches["default"].clear()
+        self.user = HomeChoiceUser.objects.create(username="shopper", email="shopper@example.com")
+        self.client.force_login(self.user)
+
+    def make_products(self, count, price="10.00"):
+        return Product.objects.bulk_create(
+            [Product(product_name=f"Product {i}", product_price=Decimal(price)) for i in range(count)]
+        )
+
+
+class CartReadTests(CartTestCase):
+    def fill_cart(self, lines):
+        products = self.make_products(lines)
+        variants = ProductVariant.objects.bulk_create(
+            [ProductVariant(product=product, product_variant_name=f"{product.pk}kg") for product in products]
+        )
+        for product, variant in zip(products, variants):
+            store.add(self.user.id, product_id=product.pk)
+            store.add(self.user.id, variant_id=variant.pk, quantity=2)
+        store.flush(self.user.id)
+
+    def test_get_cart_query_count_is_constant(self):
+        for lines in (1, 10):
+            with self.subTest(lines=lines):
+                store.clear(self.user.id)
+                self.fill_cart(lines)
+                # The session user, then one query each for products and variants
+                with self.assertNumQueries(3):
+                    response = self.client.get("/cartapi/api/cart")
+                self.assertEqual(len(response.json()["data"]["items"]), 2 * lines)
+
+    def test_variant_lines_fall_back_to_the_product_price(self):
+        self.fill_cart(1)
+        items = self.client.get("/cartapi/api/cart").json()["data"]["items"]
+        self.assertEqual([item["unit_price"] for item in items], ["10.00", "10.00"])
+        self.assertEqual(Cart.objects.get(user=self.user).total_price(), Decimal("30.00"))
+
+    def test_live_and_stored_totals_share_the_pricing_rule(self):
+        self.fill_cart(2)
+        ProductVariant.objects.filter(pk=ProductVariant.objects.earliest("pk").pk).update(
+            product_variant_price=Decimal("4.50")
+        )
+        data = self.client.get("/cartapi/api/cart").json()["data"]
+        cart = Cart.objects.get(user=self.user)
+        items = cart.items.select_related("product", "variant__product")
+        self.assertEqual(sorted(item["unit_price"] for item in data["items"]), ["10.00", "10.00", "10.00", "4.50"])
+        self.assertEqual(Decimal(data["total_price"]), cart.total_price())
+        self.assertEqual(sum(item.total_item_price() for item in items), cart.total_price())
+
+
+class CartFlushTests(CartTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = HomeChoiceUser.objects.create(username="other", email="other@example.com")
+        self.product = self.make_products(1)[0]
+        self.line = store.line_key(self.product.pk, None)
+
+    def set_quantity(self, user, quantity):
+        store.add(user.id, product_id=self.product.pk)
+        store.flush(user.id)
+        store.apply(user.id, [("set", self.line, quantity)])
+
+    def test_dirty_cart_does_not_expire_until_written(self):
+        self.set_quantity(self.user, 4)
+        redis = store._redis()
+        self.assertEqual(redis.ttl(store._key(self.user.id)), -1)
+
+        store.flush_dirty()
+        self.assertGreater(redis.ttl(store._key(self.user.id)), 0)
+        self.assertEqual(Cart.objects.get(user=self.user).items.get().quantity, 4)
+
+    def test_cart_of_deleted_user_is_dropped(self):
+        self.set_quantity(self.user, 4)
+        self.set_quantity(self.other, 2)
+        self.other.delete()
+
+        self.assertEqual(store.flush_dirty(), 2)
+        self.assertEqual(Cart.objects.get(user=self.user).items.get().quantity, 4)
+        self.assertFalse(store._redis().exists(store._key(self.other.id)))
+        self.assertFalse(store._redis().smembers(store.DIRTY_KEY))
+
+    def test_failing_cart_does_not_block_its_batch(self):
+        self.set_quantity(self.user, 4)
+        self.set_quantity(self.other, 2)
+        write = store._write
+
+        def failing_write(carts):
+            if self.other.id in carts:
+                raise IntegrityError("bad cart")
+            return write(carts)
+
+        with mock.patch.object(store, "_write", failing_write), self.assertLogs("HCCart.utils.store", "ERROR"):
+            self.assertEqual(store.flush_dirty(), 1)
+        self.assertEqual(Cart.objects.get(user=self.user).items.get().quantity, 4)
+        self.assertEqual(store._redis().smembers(store.DIRTY_KEY), {str(self.other.id).encode()})
+
+
+class CheckoutTests(CartTestCase):
+    def checkout(self, cart_id):
+        return self.client.post(
+            "/cartapi/api/cart/checkout", {"cart_id": cart_id, "amount": 10}, content_type="application/json"
+        )
+
+    def test_checkout_flushes_the_buyers_cart(self):
+        product = self.make_products(1)[0]
+        store.add(self.user.id, product_id=product.pk)
+        store.apply(self.user.id, [("set", store.line_key(product.pk), 3)])
+
+        response = self.checkout(Cart.objects.get(user=self.user).pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 3)
+
+    def test_foreign_cart_is_not_flushed(self):
+        other = HomeChoiceUser.objects.create(username="other", email="other@example.com")
+        product = self.make_products(1)[0]
+        store.add(other.id, product_id=product.pk)
+        store.apply(other.id, [("set", store.line_key(product.pk), 3)])
+
+        self.assertEqual(self.checkout(Cart.objects.get(user=other).pk).status_code, 404)
+        self.assertTrue(store._redis().sismember(store.DIRTY_KEY, other.id))
+        self.assertEqual(CartItem.objects.get(cart__user=other).quantity, 1)
+
+
+class ConcurrentAddTests(TransactionTestCase):
+    # Threads need committed rows and their own connections
+    THREADS = 8
+
+    def setUp(self):
+        caches["default"].clear()
+        self.user = HomeChoiceUser.objects.create(username="shopper", email="shopper@example.com")
+        self.product = Product.objects.create(product_name="Ribeye", product_price=Decimal("100.00"))
+        self.variant = ProductVariant.objects.create(product=self.product, product_variant_name="1kg")
+        store.ensure_loaded(self.user.id)
+
+    def add_concurrently(self, **line):
+        barrier, errors = threading.Barrier(self.THREADS), []
+
+        def add():
+            try:
+                barrier.wait()
+                store.add(self.user.id, **line)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_first_adds_of_a_line_share_one_row(self):
+        for line in ({"product_id": self.product.pk}, {"variant_id": self.variant.pk}):
+            with self.subTest(**line):
+                self.add_concurrently(**line)
+                item = CartItem.objects.get(cart__user=self.user, **line)
+                self.assertEqual(store.get_lines(self.user.id)[1][store.line_key(**line)]["id"], item.pk)
+
+                store.flush(self.user.id)
+                item.refresh_from_db()
+                self.assertEqual(item.quantity, self.THREADS)
+
+
+class CartAddTests(CartTestCase):
+    def test_quantity_below_one_is_rejected(self):
+        product = self.make_products(1)[0]
+        store.add(self.user.id, product_id=product.pk, quantity=3)
+        store.flush(self.user.id)
+
+        for quantity in (0, -2):
+            with self.subTest(quantity=quantity):
+                response = self.client.post(
+                    "/productapi/api/cart/add",
+                    {"product_id": product.pk, "quantity": quantity},
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+        _, lines = store.get_lines(self.user.id)
+        self.assertEqual(lines[store.line_key(product.pk)]["quantity"], 3)
+        self.assertFalse(store._redis().sismember(store.DIRTY_KEY, self.user.id))
+        with self.assertRaises(ValueError):
+            store.add(self.user.id, product_id=product.pk, quantity=-1)
+
+    def test_guest_quantity_below_one_is_rejected(self):
+        self.client.logout()
+        product = self.make_products(1)[0]
+        url = "/productapi/api/cart/add"
+        self.client.post(url, {"product_id": product.pk, "quantity": 2}, content_type="application/json")
+
+        response = self.client.post(url, {"product_id": product.pk, "quantity": -1}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        token = self.client.session[guest.GUEST_CART_SESSION_KEY]
+        self.assertEqual(guest.get_lines(token)[store.line_key(product.pk)]["quantity"], 2)
+        with self.assertRaises(ValueError):
+            guest.add(token, product_id=product.pk, quantity=0)
@@ -0,0 +1,90 @@
+from HCCart.utils import guest, store
+from HCProduct.models import Product, ProductVariant
+
+CART_OPERATIONS = ("set", "add", "remove")
+MAX_CART_OPERATIONS = 200
+
+
+class CartBatchError(ValueError):
+    pass
+
+
+def _result(index, operation, status, message=None):
+    result = {
+        "index": index,
+        "op": operation.op,
+        "product_id": operation.product_id,
+        "variant_id": operation.variant_id,
+        "status": status,
+    }
+    if message:
+        result["message"] = message
+    return result
+
+
+def _plan(operation, products, variants):
+    """
+    One operation -> (op, line, quantity) for store.apply().
+    """
+    if operation.op not in CART_OPERATIONS:
+        raise CartBatchError(f"op must be one of: {', '.join(CART_OPERATIONS)}.")
+    if bool(operation.product_id) == bool(operation.variant_id):
+        raise CartBatchError("Exactly one of product_id or variant_id is required.")
+    line = store.line_key(operation.product_id, operation.variant_id)
+    if operation.op == "remove":
+        # Allowed for deleted products too, so stale local lines can be dropped
+        return operation.op, line, 0
+
+    if operation.product_id and operation.product_id not in products:
+        raise CartBatchError("Product not found.")
+    if operation.variant_id and operation.variant_id not in variants:
+        raise CartBatchError("Variant not found.")
+    quantity = operation.quantity
+    if quantity is None or quantity < (1 if operation.op == "add" else 0):
+        raise CartBatchError("add needs a quantity of at least 1; set needs 0 or more.")
+    return operation.op, line, quantity
+
+
+def apply_cart_batch(operations, user_id=None, token=None):
+    """
+    Validate every operation, then apply them all at once: to the user's live
+    cart, written through to Postgres as one bulk update, one DELETE and one
+    upsert per kind of line in a single transaction (see store._write), or
+    without a user to the guest cart `token` in Redis only.
+
+    Returns `(success, results)` with one result per operation, in order. If
+    any operation is invalid nothing is applied.
+    """
+    products = set(
+        Product.objects.filter(
+            pk__in={operation.product_id for operation in operations if operation.product_id}
+        ).values_list("pk", flat=True)
+    )
+    variants = set(
+        ProductVariant.objects.filter(
+            pk__in={operation.variant_id for operation in operations if operation.variant_id}
+        ).values_list("pk", flat=True)
+    )
+
+    changes, results, failed = [], [], False
+    for index, operation in enumerate(operations):
+        try:
+            changes.append(_plan(operation, products, variants))
+        except CartBatchError as e:
+            failed = True
+            results.append(_result(index, operation, "error", str(e)))
+            continue
+        results.append(_result(index, operation, "applied"))
+
+    if failed:
+        for result in results:
+            if result["status"] != "error":
+                result["status"] = "skipped"
+        return False, results
+
+    if user_id is None:
+        guest.apply(token, changes)
+        return True, results
+    store.apply(user_id, changes)
+    store.flush(user_id)
+    return True, results
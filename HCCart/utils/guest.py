@@ -0,0 +1,85 @@
+import secrets
+
+from django.conf import settings
+
+from HCCart.utils import store
+
+# Session entry holding the guest cart token. Sessions are cache-backed, so a
+# guest cart creates no database rows until its owner logs in.
+GUEST_CART_SESSION_KEY = "guest_cart"
+
+
+def guest_token(request, create=False):
+    """
+    The request's guest cart token, or None. With `create`, a new token is
+    stored in the session when there is none yet.
+    """
+    token = request.session.get(GUEST_CART_SESSION_KEY)
+    if token is None and create:
+        token = request.session[GUEST_CART_SESSION_KEY] = secrets.token_urlsafe(16)
+    return token
+
+
+def _key(token):
+    return f"cart:guest:{token}"
+
+
+def get_lines(token):
+    """
+    Guest cart contents as {line: {"quantity", "id"}}, like store.get_lines().
+    Guest lines have no CartItem row, so "id" is always None.
+    """
+    if not token:
+        return {}
+    _, lines = store._decode(store._redis().hgetall(_key(token)))
+    return {line: entry for line, entry in lines.items() if entry["quantity"] > 0}
+
+
+def apply(token, changes):
+    """
+    Apply [(op, line, quantity)] like store.apply() and restart the TTL.
+    """
+    key = _key(token)
+    with store._redis().pipeline() as pipe:
+        store.queue_changes(pipe, key, changes)
+        pipe.expire(key, settings.GUEST_CART_TTL)
+        pipe.execute()
+
+
+def add(token, product_id=None, variant_id=None, quantity=1):
+    """
+    Add to the guest cart. Returns the line's new quantity.
+    """
+    if quantity < 1:
+        raise ValueError("quantity must be at least 1")
+    key, line = _key(token), store.line_key(product_id, variant_id)
+    with store._redis().pipeline() as pipe:
+        pipe.hincrby(key, f"q:{line}", quantity)
+        pipe.expire(key, settings.GUEST_CART_TTL)
+        return pipe.execute()[0]
+
+
+def clear(token):
+    if token:
+        store._redis().delete(_key(token))
+
+
+def merge_into_user(token, user_id):
+    """
+    Add the guest cart to the user's cart and drop it. Quantities of lines in
+    both carts are summed. The user's cart is written through at once, so the
+    merge reaches Postgres as one transaction with one bulk upsert per kind
+    of line (product or variant) for the new lines (lines of deleted products are dropped there).
+    """
+    redis, key = store._redis(), _key(token)
+    with redis.pipeline() as pipe:
+        # Read and delete together, so a second login cannot merge it again
+        pipe.hgetall(key)
+        pipe.delete(key)
+        raw, _ = pipe.execute()
+    _, lines = store._decode(raw)
+    changes = [("add", line, entry["quantity"]) for line, entry in lines.items() if entry["quantity"] > 0]
+    if not changes:
+        return
+    store.apply(user_id, changes)
+    store.flush(user_id)
@@ -0,0 +1,409 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+
+from HCCart.models import Cart, CartItem
+from HCProduct.models import Product, ProductVariant
+
+logger = logging.getLogger(__name__)
+
+# Users whose Redis cart has changes not yet written to Postgres
+DIRTY_KEY = "cart:dirty"
+
+# Hash fields: "cart_id" (also marks the hash as loaded), then per line
+# "q:<line>" = quantity and "i:<line>" = CartItem id once the row exists.
+# A quantity of 0 is a removal waiting to be written. A hash only expires
+# (after CART_STORE_TTL) while it has nothing left to write.
+CART_ID_FIELD = "cart_id"
+
+# KEYS: cart hash, dirty set; ARGV: user id, TTL. Re-arms the expiry of a
+# written cart unless a change marked it dirty again meanwhile.
+_EXPIRE_IF_CLEAN = """
+if redis.call("SISMEMBER", KEYS[2], ARGV[1]) == 0 then
+    return redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _key(user_id):
+    return f"cart:{user_id}"
+
+
+def line_key(product_id=None, variant_id=None):
+    return f"{product_id or 0}-{variant_id or 0}"
+
+
+def parse_line(line):
+    product_id, variant_id = (int(part) or None for part in line.split("-"))
+    return product_id, variant_id
+
+
+def _decode(raw):
+    """
+    HGETALL result -> (cart_id, {line: {"quantity", "id"}}).
+    """
+    data = {field.decode(): value.decode() for field, value in raw.items()}
+    cart_id = int(data.pop(CART_ID_FIELD)) if CART_ID_FIELD in data else None
+    lines = {}
+    for field, value in data.items():
+        kind, line = field.split(":", 1)
+        entry = lines.setdefault(line, {"quantity": 0, "id": None})
+        if kind == "q":
+            entry["quantity"] = int(value)
+        else:
+            entry["id"] = int(value)
+    return cart_id, lines
+
+
+def _load(user_id):
+    """
+    Copy the user's Cart/CartItem rows into Redis unless another request
+    already did. Returns the cart id.
+    """
+    cart, _ = Cart.objects.get_or_create(user_id=user_id)
+    mapping = {CART_ID_FIELD: cart.id}
+    for item in cart.items.all():
+        line = line_key(item.product_id, item.variant_id)
+        mapping[f"q:{line}"] = item.quantity
+        mapping[f"i:{line}"] = item.id
+
+    redis, key = _redis(), _key(user_id)
+    with redis.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.hexists(key, CART_ID_FIELD):
+                return int(pipe.hget(key, CART_ID_FIELD))
+            pipe.multi()
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, settings.CART_STORE_TTL)
+            pipe.execute()
+        except WatchError:
+            # Loaded (and maybe changed) concurrently: keep that copy
+            return int(redis.hget(key, CART_ID_FIELD))
+    return cart.id
+
+
+def ensure_loaded(user_id):
+    """
+    Return the user's cart id, loading the cart into Redis on first use.
+    """
+    cart_id = _redis().hget(_key(user_id), CART_ID_FIELD)
+    return int(cart_id) if cart_id is not None else _load(user_id)
+
+
+def _mark_dirty(pipe, user_id):
+    # Unwritten changes must not expire with the hash
+    pipe.persist(_key(user_id))
+    pipe.sadd(DIRTY_KEY, user_id)
+
+
+def get_lines(user_id):
+    """
+    Live cart contents: (cart_id, {line: {"quantity", "id"}}) without removed lines.
+    """
+    ensure_loaded(user_id)
+    cart_id, lines = _decode(_redis().hgetall(_key(user_id)))
+    return cart_id, {line: entry for line, entry in lines.items() if entry["quantity"] > 0}
+
+
+def _upsert(rows, add):
+    """
+    INSERT ... ON CONFLICT DO UPDATE cart rows. `rows` is
+    {(cart_id, product_id, variant_id): quantity}; with `add` the quantity
+    is added to an existing row's, otherwise it replaces it. Product lines
+    and variant lines each have their own partial unique index (see
+    CartItem.Meta), so each kind is one statement naming that index's
+    predicate. Returns {(cart_id, product_id, variant_id): (id, quantity)}.
+    """
+    qn = connection.ops.quote_name
+    table = qn(CartItem._meta.db_table)
+    cart, product, variant, quantity = (
+        qn(CartItem._meta.get_field(name).column) for name in ("cart", "product", "variant", "quantity")
+    )
+    new_quantity = f"{table}.{quantity} + EXCLUDED.{quantity}" if add else f"EXCLUDED.{quantity}"
+    now = timezone.now()
+    result = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for target, predicate in ((product, f"{variant} IS NULL"), (variant, f"{variant} IS NOT NULL")):
+            batch = [(ids, amount) for ids, amount in rows.items() if (ids[2] is None) == (target == product)]
+            if not batch:
+                continue
+            cursor.execute(
+                f"INSERT INTO {table} ({cart}, {product}, {variant}, {quantity}, {qn('added_at')}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({cart}, {target}) WHERE {predicate} "
+                f"DO UPDATE SET {quantity} = {new_quantity} "
+                f"RETURNING {qn('id')}, {cart}, {product}, {variant}, {quantity}",
+                [value for ids, amount in batch for value in (*ids, amount, now)],
+            )
+            result.update({tuple(row[1:4]): (row[0], row[4]) for row in cursor})
+    return result
+
+
+def add_items(cart_id, lines):
+    """
+    Add quantities to cart rows with INSERT ... ON CONFLICT on the line's
+    unique index, so concurrent adds of the same line sum up instead of
+    racing to a duplicate row or a lost update. `lines` is
+    [(product_id, variant_id, quantity)]. Returns
+    {(product_id, variant_id): (cart_item_id, quantity)} with the row totals.
+    """
+    merged = {}
+    for product_id, variant_id, quantity in lines:
+        # ON CONFLICT cannot touch a row twice per statement
+        key = (cart_id, product_id or None, variant_id or None)
+        merged[key] = merged.get(key, 0) + quantity
+    return {key[1:]: row for key, row in _upsert(merged, add=True).items()}
+
+
+def add(user_id, product_id=None, variant_id=None, quantity=1):
+    """
+    Add `quantity` of a product or variant. Only a line the cart has no row
+    for yet touches Postgres (one upsert, so clients get its id); everything
+    else stays in Redis until the next flush. Returns (cart_item_id, quantity).
+    """
+    if quantity < 1:
+        # A negative add would lower an existing line behind the caller's back
+        raise ValueError("quantity must be at least 1")
+    cart_id = ensure_loaded(user_id)
+    line = line_key(product_id, variant_id)
+    redis, key = _redis(), _key(user_id)
+    with redis.pipeline() as pipe:
+        # A removed line sits at 0, so adding always counts up from there
+        pipe.hincrby(key, f"q:{line}", quantity)
+        pipe.hget(key, f"i:{line}")
+        _mark_dirty(pipe, user_id)
+        new_quantity, item_id = pipe.execute()[:2]
+    if item_id is not None:
+        return int(item_id), new_quantity
+
+    # Concurrent first adds of the line each add their own quantity to the one
+    # row; Redis stays authoritative and the next flush writes its total
+    item_id, _ = add_items(cart_id, [(product_id, variant_id, quantity)])[(product_id or None, variant_id or None)]
+    redis.hsetnx(key, f"i:{line}", item_id)
+    return item_id, new_quantity
+
+
+def apply(user_id, changes):
+    """
+    Apply several line changes atomically (one MULTI/EXEC). `changes` is
+    [(op, line, quantity)] with op "set", "add" or "remove", applied in order.
+    The caller decides when to flush.
+    """
+    ensure_loaded(user_id)
+    with _redis().pipeline() as pipe:
+        queue_changes(pipe, _key(user_id), changes)
+        _mark_dirty(pipe, user_id)
+        pipe.execute()
+
+
+def queue_changes(pipe, key, changes):
+    for op, line, quantity in changes:
+        if op == "add":
+            pipe.hincrby(key, f"q:{line}", quantity)
+        else:
+            pipe.hset(key, f"q:{line}", quantity if op == "set" else 0)
+
+
+def remove_item(user_id, cart_item_id):
+    """
+    Remove the line stored as CartItem `cart_item_id`. Returns False if the
+    user's cart has no such line.
+    """
+    ensure_loaded(user_id)
+    _, lines = _decode(_redis().hgetall(_key(user_id)))
+    for line, entry in lines.items():
+        if entry["id"] == cart_item_id and entry["quantity"] > 0:
+            with _redis().pipeline() as pipe:
+                pipe.hset(_key(user_id), f"q:{line}", 0)
+                _mark_dirty(pipe, user_id)
+                pipe.execute()
+            return True
+    return False
+
+
+def clear(user_id):
+    ensure_loaded(user_id)
+    _, lines = _decode(_redis().hgetall(_key(user_id)))
+    if not lines:
+        return
+    with _redis().pipeline() as pipe:
+        pipe.hset(_key(user_id), mapping={f"q:{line}": 0 for line in lines})
+        _mark_dirty(pipe, user_id)
+        pipe.execute()
+
+
+def _flush_lock(user_id):
+    # Two flushes of one cart must not interleave, or an older read could win
+    return caches["default"].lock(f"cart:{user_id}:flush", timeout=30)
+
+
+def _existing(model, ids):
+    return set(model.objects.filter(pk__in=ids).values_list("pk", flat=True)) if ids else set()
+
+
+def _write(carts):
+    """
+    Write the Redis state of several carts to Postgres in one transaction:
+    one bulk_update, one DELETE and one upsert per kind of line for all of them.
+    `carts` is {user_id: (cart_id, lines)}. Returns the follow-ups for Redis
+    as (user_id, line, action, inserted id).
+    """
+    # A cart deleted meanwhile (e.g. with its user) has nothing to write to
+    existing_carts = _existing(Cart, {cart_id for cart_id, _ in carts.values()})
+    follow_ups = [
+        (user_id, None, "drop_cart", None) for user_id, (cart_id, _) in carts.items() if cart_id not in existing_carts
+    ]
+    lines = [
+        (user_id, cart_id, line, entry)
+        for user_id, (cart_id, cart_lines) in carts.items()
+        if cart_id in existing_carts
+        for line, entry in cart_lines.items()
+    ]
+    parsed = {line: parse_line(line) for _, _, line, _ in lines}
+    # Lines whose product or variant has been deleted since are dropped
+    products = _existing(Product, {ids[0] for ids in parsed.values() if ids[0]})
+    variants = _existing(ProductVariant, {ids[1] for ids in parsed.values() if ids[1]})
+
+    updates, deletes, inserts = [], [], []
+    for user_id, cart_id, line, entry in lines:
+        product_id, variant_id = parsed[line]
+        gone = (product_id and product_id not in products) or (variant_id and variant_id not in variants)
+        if gone or entry["quantity"] <= 0:
+            if entry["id"] is not None:
+                deletes.append(entry["id"])
+            follow_ups.append((user_id, line, "drop" if gone else "removed", None))
+        elif entry["id"] is not None:
+            updates.append(CartItem(id=entry["id"], quantity=entry["quantity"]))
+        else:
+            inserts.append((user_id, line, (cart_id, product_id, variant_id), entry["quantity"]))
+
+    rows = {}
+    with transaction.atomic():
+        if updates:
+            CartItem.objects.bulk_update(updates, ["quantity"])
+        if deletes:
+            CartItem.objects.filter(id__in=deletes).delete()
+        if inserts:
+            # A row may exist already (added since the line was read, or
+            # re-added after its removal was written): take the Redis quantity
+            rows = _upsert({ids: amount for _, _, ids, amount in inserts}, add=False)
+    follow_ups.extend((user_id, line, "inserted", rows[ids][0]) for user_id, line, ids, _ in inserts)
+    return follow_ups
+
+
+def _settle(follow_ups):
+    """
+    After a write: record new row ids, drop lines of deleted products (or
+    whole carts that no longer exist), and forget removed lines unless they
+    were re-added meanwhile (their row is then recreated on the next flush).
+    """
+    redis = _redis()
+    for user_id, line, action, item_id in follow_ups:
+        key = _key(user_id)
+        if action == "drop_cart":
+            redis.delete(key)
+            continue
+        if action == "inserted":
+            redis.hsetnx(key, f"i:{line}", item_id)
+            continue
+        if action == "drop":
+            redis.hdel(key, f"q:{line}", f"i:{line}")
+            continue
+        with redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    quantity = int(pipe.hget(key, f"q:{line}") or 0)
+                    pipe.multi()
+                    if quantity <= 0:
+                        pipe.hdel(key, f"q:{line}", f"i:{line}")
+                    else:
+                        pipe.hdel(key, f"i:{line}")
+                        pipe.sadd(DIRTY_KEY, user_id)
+                    pipe.execute()
+                    break
+                except WatchError:
+                    continue
+
+
+def _write_carts(carts, raise_errors):
+    """
+    Write claimed carts and settle them in Redis. If the batch fails, each
+    cart is retried alone so one bad cart cannot hold back the others; carts
+    that still fail are logged and marked dirty again. Returns the number
+    written.
+    """
+    redis = _redis()
+    try:
+        _settle(_write(carts))
+    except Exception:
+        if len(carts) > 1:
+            return sum(_write_carts({user_id: cart}, raise_errors) for user_id, cart in carts.items())
+        redis.sadd(DIRTY_KEY, *carts)
+        if raise_errors:
+            raise
+        logger.exception("Failed to write the cart of user %s; it stays dirty", next(iter(carts)))
+        return 0
+
+    expire_if_clean = redis.register_script(_EXPIRE_IF_CLEAN)
+    for user_id in carts:
+        expire_if_clean(keys=[_key(user_id), DIRTY_KEY], args=[user_id, settings.CART_STORE_TTL])
+    return len(carts)
+
+
+def _flush_users(user_ids, blocking):
+    redis = _redis()
+    locks, carts = [], {}
+    try:
+        for user_id in user_ids:
+            lock = _flush_lock(user_id)
+            if not lock.acquire(blocking=blocking):
+                # Another flush has it; it stays dirty for the next round
+                continue
+            locks.append(lock)
+            # Claimed from here: changes made from now on mark the cart dirty
+            # again. Already clean means a flush that held the lock wrote it.
+            if not redis.srem(DIRTY_KEY, user_id):
+                continue
+            cart_id, lines = _decode(redis.hgetall(_key(user_id)))
+            if cart_id is None:
+                # Dirty hashes do not expire, so this one was deleted by hand
+                logger.warning("Dirty cart of user %s is gone from Redis; nothing to write", user_id)
+                continue
+            carts[user_id] = (cart_id, lines)
+        # A blocking flush is for one cart a caller is about to read: raise
+        return _write_carts(carts, raise_errors=blocking) if carts else 0
+    finally:
+        for lock in locks:
+            lock.release()
+
+
+def flush_dirty(batch_size=200):
+    """
+    Write up to `batch_size` changed carts back to Postgres. Carts another
+    flush is busy with, and carts that failed (logged), are left for the next
+    round. Returns the number written.
+    """
+    user_ids = [int(user_id) for user_id in _redis().srandmember(DIRTY_KEY, batch_size)]
+    if not user_ids:
+        return 0
+    return _flush_users(user_ids, blocking=False)
+
+
+def flush(user_id):
+    """
+    Synchronously write one user's cart, e.g. before checkout reads it. Also
+    waits for a flush of it that is already running elsewhere.
+    """
+    _flush_users([user_id], blocking=True)
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+
+from HCCart.models import CartItem
+from HCCart.utils.store import parse_line
+from HCProduct.models import Product, ProductVariant
+
+PRICE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+# A line costs its variant's price when it has one, else its product's: the
+# line's own product, or the variant's parent product for a variant line.
+# Paths from a cart line, first non-null wins. The single definition of the
+# rule: UNIT_PRICE applies it in SQL, unit_price() in Python.
+PRICE_PATHS = (
+    "variant__product_variant_price",
+    "product__product_price",
+    "variant__product__product_price",
+)
+UNIT_PRICE = Coalesce(*(F(path) for path in PRICE_PATHS), output_field=PRICE_FIELD)
+LINE_TOTAL = ExpressionWrapper(F("quantity") * UNIT_PRICE, output_field=PRICE_FIELD)
+
+
+def unit_price(item):
+    """
+    UNIT_PRICE for a CartItem (saved or not) whose product and variant are
+    loaded. None when nothing on the line has a price.
+    """
+    for path in PRICE_PATHS:
+        value = item
+        for name in path.split("__"):
+            value = getattr(value, name)
+            if value is None:
+                break
+        if value is not None:
+            return value
+    return None
+
+
+def price_lines(lines):
+    """
+    Price live cart lines ({line: {"quantity", "id"}} from utils/store.py) with
+    two queries at most. Returns (items, total); lines whose product or variant
+    no longer exists are left out.
+
+    The lines live in Redis rather than as CartItem rows, so they cannot be
+    summed with LINE_TOTAL in SQL; unit_price() applies the same rule to them.
+    """
+    parsed = {line: parse_line(line) for line in lines}
+    variant_ids = {variant_id for _, variant_id in parsed.values() if variant_id}
+    product_ids = {product_id for product_id, variant_id in parsed.values() if product_id and not variant_id}
+    variants = ProductVariant.objects.select_related("product").in_bulk(variant_ids) if variant_ids else {}
+    products = Product.objects.in_bulk(product_ids) if product_ids else {}
+
+    items, total = [], Decimal("0")
+    for line, entry in sorted(lines.items(), key=lambda pair: pair[1]["id"] or 0):
+        product_id, variant_id = parsed[line]
+        variant = variants.get(variant_id)
+        product = variant.product if variant else products.get(product_id)
+        if product is None:
+            continue
+        # Unsaved: only carries the line's relations for unit_price()
+        item = CartItem(product=None if variant else product, variant=variant, quantity=entry["quantity"])
+        price = unit_price(item) or Decimal("0")
+        line_total = price * entry["quantity"]
+        total += line_total
+        items.append({
+            "cart_item_id": entry["id"],
+            "product_id": product_id,
+            "variant_id": variant_id,
+            "product_name": product.product_name if not variant else variant.product_variant_name,
+            "quantity": entry["quantity"],
+            "unit_price": price,
+            "total_price": line_total,
+        })
+    return items, total
+
+
+def cart_total(cart):
+    """
+    Sum of the cart's lines computed in the database.
+    """
+    return cart.items.aggregate(total=Sum(LINE_TOTAL))["total"] or 0
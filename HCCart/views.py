@@ -5,7 +5,6 @@ from ninja_extra import NinjaExtraAPI, api_controller, http_get
 from ninja_extra.permissions import IsAuthenticated
 from .schemas import CartItemSchema, CartSchema
 from HCProduct.models import Product, Category, ProductVariant
-from HCCart.models import Cart, CartItem
 from django.contrib.auth import authenticate, logout, login
 from ninja_jwt.controller import NinjaJWTDefaultController
 from ninja_jwt.controller import TokenObtainPairController
@@ -20,9 +19,12 @@ from ninja_jwt.authentication import JWTAuth
 from HCUser.utils.permission_auth_util import ClerkAuthenticationPermission
 from HCUser.utils.auth_util import clerk_authenticated
 
-from django.contrib.auth.decorators import login_required
 from HCCart.models import CheckoutSession, Cart
-from HCCart.schemas import CheckoutSessionCreateSchema, CheckoutSessionOutSchema
+from HCCart.schemas import CartBatchSchema, CheckoutSessionCreateSchema, CheckoutSessionOutSchema
+from HCCart.utils import guest as guest_cart
+from HCCart.utils import store as cart_store
+from HCCart.utils.batch import MAX_CART_OPERATIONS, apply_cart_batch
+from HCCart.utils.totals import price_lines
 import uuid
 
 """NinjaExtra API FOR HomeChoice"""
@@ -37,33 +39,68 @@ api.register_controllers(NinjaJWTDefaultController)
 
 # csrf_cache = caches["default"]
 
+def _cart_lines(request):
+    if request.user.is_authenticated:
+        return cart_store.get_lines(request.user.id)
+    return None, guest_cart.get_lines(guest_cart.guest_token(request))
+
 """Get User Cart"""
 
 @api.get("/cart", tags=["cart"])
 def get_cart(request):
     """
-    Retrieve the cart details for the logged-in user.
+    Retrieve the cart details for the logged-in user, or the guest cart of
+    an anonymous session (`cart_id` is then null).
+    Lines come from the live Redis cart; prices take at most two queries.
     """
-    cart = get_object_or_404(Cart, user=request.user)
-    cart_items = cart.items.all()
+    cart_id, lines = _cart_lines(request)
+    items, total = price_lines(lines)
 
     cart_data = {
-        "cart_id": cart.id,
-        "total_price": cart.total_price(),
-        "items": [
-            {
-                "cart_item_id": item.id,
-                "product_name": item.product.product_name if item.product else item.variant.product_variant_name,
-                "quantity": item.quantity,
-                "unit_price": item.variant.product_variant_price if item.variant else item.product.product_price,
-                "total_price": item.total_item_price()
-            }
-            for item in cart_items
-        ]
+        "cart_id": cart_id,
+        "total_price": total,
+        "items": items,
     }
 
     return JsonResponse({"success": True, "data": cart_data})
 
+"""Batch Cart Changes"""
+
+@api.post("/cart/batch", tags=["cart"])
+def batch_cart(request, payload: CartBatchSchema):
+    """
+    Apply many cart changes in one request, e.g. to sync a local cart after
+    login. Each operation is `set` (quantity 0 removes), `add` or `remove`,
+    keyed by `product_id` or `variant_id`, applied in order. All apply, or
+    none do. Returns the resulting cart like GET /cart.
+    Guests use this to change or remove lines of their cart.
+    """
+    if not payload.operations:
+        return JsonResponse({"success": False, "message": "No operations given."}, status=400)
+    if len(payload.operations) > MAX_CART_OPERATIONS:
+        return JsonResponse(
+            {"success": False, "message": f"At most {MAX_CART_OPERATIONS} operations per batch."}, status=400
+        )
+
+    if request.user.is_authenticated:
+        success, results = apply_cart_batch(payload.operations, user_id=request.user.id)
+    else:
+        success, results = apply_cart_batch(payload.operations, token=guest_cart.guest_token(request, create=True))
+    if not success:
+        return JsonResponse(
+            {"success": False, "message": "Batch rejected; nothing was applied.", "results": results}, status=400
+        )
+
+    cart_id, lines = _cart_lines(request)
+    items, total = price_lines(lines)
+    cart_data = {
+        "cart_id": cart_id,
+        "total_price": total,
+        "items": items,
+    }
+
+    return JsonResponse({"success": True, "results": results, "data": cart_data})
+
 """Clear Cart"""
 
 @api.delete("/cart/clear", tags=["cart"])
@@ -71,8 +108,10 @@ def clear_cart(request):
     """
     Clear all items in the cart.
     """
-    cart = get_object_or_404(Cart, user=request.user)
-    cart.items.all().delete()
+    if request.user.is_authenticated:
+        cart_store.clear(request.user.id)
+    else:
+        guest_cart.clear(guest_cart.guest_token(request))
 
     return JsonResponse({"success": True, "message": "Cart cleared."})
 
@@ -84,6 +123,8 @@ def create_checkout_session(request, payload: CheckoutSessionCreateSchema):
     Initiate a checkout session for the user's cart.
     """
     cart = get_object_or_404(Cart, id=payload.cart_id, user=request.user)
+    # Pending Redis changes must be in Postgres before the cart is read
+    cart_store.flush(cart.user_id)
 
     if not cart.items.exists():
         return JsonResponse({"success": False, "message": "Cart is empty."}, status=400)
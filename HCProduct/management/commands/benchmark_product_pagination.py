@@ -0,0 +1,88 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from HCProduct.models import Product
+from HCProduct.utils.pagination import cursor_values
+from HCProduct.utils.snapshots import rebuild_snapshots
+from HCProduct.views import PRODUCT_ORDERING, _build_products_page
+
+
+class Command(BaseCommand):
+    help = "Compare /products page latency for offset and cursor pagination at a deep page."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page", type=int, default=1000, help="1-based page number to measure (default 1000)")
+        parser.add_argument("--limit", type=int, default=12, help="Page size (default 12)")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per mode (default 20)")
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Insert this many throwaway products first; they are rolled back afterwards",
+        )
+
+    def handle(self, *args, **options):
+        page, limit, repeat = options["page"], options["limit"], options["repeat"]
+        if page < 2 or limit < 1 or repeat < 1:
+            raise CommandError("--page must be >= 2, --limit and --repeat >= 1")
+
+        with transaction.atomic():
+            if options["seed"]:
+                self._seed(options["seed"])
+
+            offset = (page - 1) * limit
+            boundary = Product.objects.order_by(*PRODUCT_ORDERING)[offset - 1 : offset].first()
+            if boundary is None:
+                raise CommandError(f"Only {Product.objects.count()} products, need more than {offset} (try --seed)")
+            cursor_position = cursor_values(boundary, PRODUCT_ORDERING)
+
+            # Uncached counts: the timing includes the COUNT(*), and seeded totals
+            # never land in the live catalog cache (a rollback cannot undo that)
+            offset_ms = self._time(repeat, lambda: _build_products_page(offset, limit, None, None, cache_count=False))
+            cursor_ms = self._time(
+                repeat,
+                lambda: _build_products_page(offset, limit, None, None, cursor_position=cursor_position, keyset=True),
+            )
+
+            # Never keep seeded rows
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"page {page} (offset {offset}, limit {limit}), {repeat} runs each")
+        self.stdout.write(self._summary("offset", offset_ms))
+        self.stdout.write(self._summary("cursor", cursor_ms))
+
+    def _seed(self, count):
+        now = timezone.now()
+        Product.objects.bulk_create(
+            [
+                Product(
+                    product_name=f"benchmark product {i}",
+                    product_price=100,
+                    created_at=now - timedelta(seconds=i),
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        # bulk_create skips signals; listings read from the snapshot table
+        rebuild_snapshots(Product.objects.filter(product_name__startswith="benchmark product ").values_list("pk", flat=True))
+
+    def _time(self, repeat, build):
+        build()  # warm up connection and plan cache
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            build()
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    def _summary(self, mode, samples):
+        return (
+            f"{mode:>6}: median {statistics.median(samples):.2f} ms, "
+            f"min {min(samples):.2f} ms, max {max(samples):.2f} ms"
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from HCProduct.models import Category, Product
+from HCProduct.utils.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate thumbnail/WebP/AVIF renditions for product and category images. "
+        "By default only images without renditions are processed, e.g. uploads "
+        "whose background job was lost on a worker restart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate renditions for every image")
+        parser.add_argument("--ids", nargs="+", type=int, help="Only these product ids (categories are skipped)")
+
+    def handle(self, *args, **options):
+        querysets = [
+            Product.objects.exclude(product_image="").exclude(product_image__isnull=True),
+            Category.objects.exclude(category_image="").exclude(category_image__isnull=True),
+        ]
+        if not options["all"]:
+            querysets = [
+                querysets[0].filter(product_image_renditions={}),
+                querysets[1].filter(category_image_renditions={}),
+            ]
+        if options["ids"]:
+            querysets = [querysets[0].filter(pk__in=options["ids"])]
+
+        processed = failed = 0
+        for queryset in querysets:
+            for instance in queryset.order_by("pk").iterator(chunk_size=100):
+                try:
+                    generate_renditions(instance)
+                    processed += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{type(instance).__name__} {instance.pk}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated renditions for {processed} images ({failed} failed)"))
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from HCProduct.utils.catalog_import import CatalogImporter, detect_format, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk upsert products, details, variants and discounts from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file ('-' for stdin)")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Rows per bulk write (default 500)")
+        parser.add_argument("--dry-run", action="store_true", help="Validate and write, then roll everything back")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be >= 1")
+        try:
+            file_format = detect_format(options["path"], options["format"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        importer = CatalogImporter(chunk_size=options["chunk_size"], dry_run=options["dry_run"])
+        if options["path"] == "-":
+            report = importer.run(iter_rows(sys.stdin.buffer, file_format))
+        else:
+            with open(options["path"], "rb") as stream:
+                report = importer.run(iter_rows(stream, file_format))
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['message']}")
+        if report["error_count"] > len(report["errors"]):
+            self.stderr.write(f"... {report['error_count'] - len(report['errors'])} more errors")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['rows']} rows: {report['created']} created, {report['updated']} updated, "
+                f"{report['error_count']} errors{' (dry run, rolled back)' if report['dry_run'] else ''}"
+            )
+        )
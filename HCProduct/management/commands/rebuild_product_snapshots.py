@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from HCProduct.models import Product
+from HCProduct.utils.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-render the ProductSnapshot read model. Run once after migrating, and "
+        "whenever snapshots may have drifted (e.g. after raw SQL or bulk updates "
+        "that bypass model signals)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Products rendered per upsert (default 500)")
+        parser.add_argument("--ids", nargs="+", type=int, help="Only rebuild these product ids")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be >= 1")
+
+        product_ids = Product.objects.order_by("pk").values_list("pk", flat=True)
+        if options["ids"]:
+            product_ids = product_ids.filter(pk__in=options["ids"])
+
+        rebuilt = 0
+        batch = []
+        # Stream ids so memory stays flat on large catalogs
+        for product_id in product_ids.iterator(chunk_size=batch_size):
+            batch.append(product_id)
+            if len(batch) == batch_size:
+                rebuilt += self._rebuild(batch)
+                batch = []
+        if batch:
+            rebuilt += self._rebuild(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} product snapshots"))
+
+    def _rebuild(self, product_ids):
+        with transaction.atomic():
+            return rebuild_snapshots(product_ids)
@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from HCProduct.utils.lifecycle import sweep
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire past-due coupons and re-render products whose discounts started "
+        "or ended, bumping the catalog cache version. Run it from cron, or with "
+        "--loop as a long-running process that wakes up at each discount boundary."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running instead of sweeping once")
+        parser.add_argument(
+            "--interval", type=int, default=60, help="Longest sleep between sweeps in seconds (default 60)"
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        if interval < 1:
+            raise CommandError("--interval must be >= 1")
+        window = timedelta(seconds=interval)
+
+        while True:
+            summary = sweep(window=window)
+            if summary["coupons_expired"] or summary["snapshots_refreshed"] or options["verbosity"] > 1:
+                self.stdout.write(
+                    f"{timezone.now():%Y-%m-%d %H:%M:%S} expired {summary['coupons_expired']} coupons, "
+                    f"refreshed {summary['snapshots_refreshed']} snapshots, "
+                    f"{len(summary['boundaries'])} discount boundaries due in the next {interval}s"
+                )
+            if not options["loop"]:
+                return
+
+            # Wake at the next boundary (or after `interval`) so prices flip on time
+            delay = interval
+            if summary["boundaries"]:
+                delay = min(delay, (summary["boundaries"][0] - timezone.now()).total_seconds())
+            close_old_connections()
+            time.sleep(max(delay, 0) + 0.05)
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.5 on 2026-10-18 02:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def populate_search_vectors(apps, schema_editor):
+    Product = apps.get_model("HCProduct", "Product")
+    Category = apps.get_model("HCProduct", "Category")
+    productDetails = apps.get_model("HCProduct", "productDetails")
+    config = settings.PRODUCT_SEARCH_CONFIG
+
+    def details_text(field):
+        return Subquery(
+            productDetails.objects.filter(product=OuterRef("pk"))
+            .values("product")
+            .annotate(text=StringAgg(field, delimiter=" "))
+            .values("text")
+        )
+
+    category_name = Subquery(
+        Category.objects.filter(pk=OuterRef("product_category_id")).values(
+            "category_name"
+        )[:1]
+    )
+    Product.objects.update(
+        search_vector=SearchVector("product_name", weight="A", config=config)
+        + SearchVector(category_name, weight="B", config=config)
+        + SearchVector(details_text("product_meatcut"), weight="B", config=config)
+        + SearchVector(details_text("product_origin"), weight="B", config=config)
+        + SearchVector(details_text("product_processing"), weight="B", config=config)
+        + SearchVector("product_description", weight="C", config=config)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("HCProduct", "0005_product_product_created_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="product_search_vector_idx"
+            ),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
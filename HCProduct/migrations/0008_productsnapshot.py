@@ -0,0 +1,207 @@
+# Generated by Django 5.1.5 on 2026-10-18 02:17
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.core.serializers.json
+import django.db.models.deletion
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _active_discount(discounts, now):
+    # Best discount active at `now`, as utils/pricing.py picks it
+    active = [
+        discount
+        for discount in discounts
+        if discount.discount_percentage is not None
+        and (
+            discount.discount_start_date is None or discount.discount_start_date <= now
+        )
+        and (discount.discount_end_date is None or discount.discount_end_date >= now)
+    ]
+    return max(
+        active,
+        key=lambda discount: (discount.discount_percentage, discount.id),
+        default=None,
+    )
+
+
+def _document(product, discount, effective_price):
+    # Same shape as utils/serializers.py serialize_product()
+    return {
+        "id": product.id,
+        "product_name": product.product_name,
+        "product_category": (
+            product.product_category.category_name if product.product_category else None
+        ),
+        "product_image": product.product_image.name or None,
+        "product_image_variants": {},
+        "product_description": product.product_description,
+        "product_price": product.product_price,
+        "product_upcoming": product.product_upcoming,
+        "product_rating": product.product_rating,
+        "effective_price": effective_price,
+        "active_discount": (
+            {
+                "id": discount.id,
+                "discount_percentage": discount.discount_percentage,
+                "discount_end_date": discount.discount_end_date,
+            }
+            if discount
+            else None
+        ),
+        "created_at": product.created_at,
+        "details": [
+            {
+                "id": detail.id,
+                "product_meatcut": detail.product_meatcut,
+                "product_weight": detail.product_weight,
+                "product_packaging": detail.product_packaging,
+                "product_origin": detail.product_origin,
+                "product_processing": detail.product_processing,
+            }
+            for detail in product.details.all()
+        ],
+    }
+
+
+def populate_snapshots(apps, schema_editor):
+    """
+    Render a snapshot for every existing product, so the catalog reads have
+    data as soon as this migration is applied. Self-contained on purpose: the
+    app's render code expects fields added by later migrations.
+    """
+    Product = apps.get_model("HCProduct", "Product")
+    ProductSnapshot = apps.get_model("HCProduct", "ProductSnapshot")
+    now = timezone.now()
+    products = (
+        Product.objects.order_by("pk")
+        .select_related("product_category")
+        .prefetch_related("details", "discounts")
+    )
+
+    batch = []
+    for product in products.iterator(chunk_size=500):
+        discounts = list(product.discounts.all())
+        discount = _active_discount(discounts, now)
+        effective_price = None
+        if product.product_price is not None:
+            percentage = discount.discount_percentage if discount else Decimal("0")
+            effective_price = (
+                product.product_price * (Decimal("100") - percentage) / Decimal("100")
+            ).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        boundaries = [
+            moment
+            for row in discounts
+            if row.discount_percentage is not None
+            for moment in (row.discount_start_date, row.discount_end_date)
+            if moment is not None and moment > now
+        ]
+        batch.append(
+            ProductSnapshot(
+                product=product,
+                category_id=product.product_category_id,
+                category_name=(
+                    product.product_category.category_name
+                    if product.product_category
+                    else None
+                ),
+                meatcuts=sorted(
+                    {
+                        detail.product_meatcut.lower()
+                        for detail in product.details.all()
+                        if detail.product_meatcut
+                    }
+                ),
+                effective_price=effective_price,
+                document=_document(product, discount, effective_price),
+                valid_until=min(boundaries, default=None),
+                created_at=product.created_at,
+            )
+        )
+        if len(batch) >= 500:
+            ProductSnapshot.objects.bulk_create(batch)
+            batch = []
+    ProductSnapshot.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("HCProduct", "0007_trigram_name_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSnapshot",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="snapshot",
+                        serialize=False,
+                        to="HCProduct.product",
+                    ),
+                ),
+                (
+                    "category_name",
+                    models.CharField(blank=True, max_length=100, null=True),
+                ),
+                (
+                    "meatcuts",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=100),
+                        blank=True,
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                (
+                    "effective_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                (
+                    "document",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                ("valid_until", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="HCProduct.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-created_at", "-product"], name="snapshot_created_idx"
+                    ),
+                    models.Index(
+                        fields=["category", "-created_at", "-product"],
+                        name="snapshot_category_created_idx",
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["meatcuts"], name="snapshot_meatcuts_idx"
+                    ),
+                    models.Index(
+                        fields=["valid_until"], name="snapshot_valid_until_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_snapshots, migrations.RunPython.noop),
+    ]
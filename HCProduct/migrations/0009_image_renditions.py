@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("HCProduct", "0008_productsnapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="category_image_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="product_image_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
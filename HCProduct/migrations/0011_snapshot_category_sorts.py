@@ -0,0 +1,61 @@
+# Generated by Django 5.1.5 on 2026-10-18 02:31
+
+import django.db.models.functions.comparison
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_ratings(apps, schema_editor):
+    Product = apps.get_model("HCProduct", "Product")
+    ProductSnapshot = apps.get_model("HCProduct", "ProductSnapshot")
+    ratings = Product.objects.filter(pk=OuterRef("product_id")).values("product_rating")
+    ProductSnapshot.objects.update(rating=Coalesce(Subquery(ratings[:1]), Decimal("0")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("HCProduct", "0010_product_external_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsnapshot",
+            name="rating",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=100),
+        ),
+        migrations.RunPython(populate_ratings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="productsnapshot",
+            index=models.Index(
+                models.F("category"),
+                django.db.models.functions.comparison.Coalesce(
+                    models.F("effective_price"),
+                    models.Value(Decimal("99999999.99")),
+                ),
+                models.F("product"),
+                name="snapshot_cat_price_asc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsnapshot",
+            index=models.Index(
+                models.F("category"),
+                django.db.models.functions.comparison.Coalesce(
+                    models.F("effective_price"),
+                    models.Value(Decimal("-1")),
+                ),
+                models.F("product"),
+                name="snapshot_cat_price_desc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsnapshot",
+            index=models.Index(
+                fields=["category", "-rating", "-product"],
+                name="snapshot_cat_rating_idx",
+            ),
+        ),
+    ]
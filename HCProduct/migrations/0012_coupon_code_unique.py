@@ -0,0 +1,53 @@
+# Generated by Django 5.1.5 on 2026-10-18 02:33
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def resolve_duplicate_codes(apps, schema_editor):
+    """
+    Make coupon codes unique without losing rows: blank codes become NULL, and
+    of each duplicated code the active, most recent coupon keeps it while the
+    others are renamed to "<code>~<id>" for an admin to review.
+    """
+    Coupon = apps.get_model("HCProduct", "Coupon")
+    Coupon.objects.filter(coupon_code="").update(coupon_code=None)
+    for code in _duplicated_codes(Coupon):
+        coupons = Coupon.objects.filter(coupon_code=code).order_by(
+            "coupon_is_expired", "-created_at", "-id"
+        )
+        for coupon in coupons[1:]:
+            suffix = f"~{coupon.pk}"
+            coupon.coupon_code = code[: 100 - len(suffix)] + suffix
+            coupon.save(update_fields=["coupon_code"])
+    remaining = _duplicated_codes(Coupon)
+    if remaining:
+        raise RuntimeError(
+            f"Coupon codes still duplicated after renaming: {', '.join(remaining)}. Resolve them by hand."
+        )
+
+
+def _duplicated_codes(Coupon):
+    return list(
+        Coupon.objects.exclude(coupon_code=None)
+        .values("coupon_code")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+        .values_list("coupon_code", flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("HCProduct", "0011_snapshot_category_sorts"),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_duplicate_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="coupon",
+            name="coupon_code",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
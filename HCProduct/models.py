@@ -1,7 +1,15 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from HCUser.utils.image_util import upload_to
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils.text import slugify
 from django.utils import timezone
 
@@ -11,10 +19,18 @@ class Category(models.Model):
     category_name = models.CharField(max_length=100, null=True, blank=True)
     slug = models.SlugField(unique=True, null=True, blank=True)
     category_image = models.ImageField(upload_to=upload_to, null=True, blank=True)
+    # {format: {width: storage name}}, filled in the background (see utils/renditions.py)
+    category_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Trigram index for typo-tolerant autocomplete (requires pg_trgm)
+            GinIndex(fields=["category_name"], name="category_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
+    
     def __str__(self) -> str:
         return self.category_name
     
@@ -26,14 +42,29 @@ class Product(models.Model):
     product_category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
     product_name = models.CharField(max_length=100, null=True, blank=True)
     product_image = models.ImageField(upload_to=upload_to, null=True, blank=True)
+    # {format: {width: storage name}}, filled in the background (see utils/renditions.py)
+    product_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     product_description = models.TextField(null=True, blank=True)
     product_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     product_upcoming = models.BooleanField(default=False)
     product_rating = models.DecimalField(max_digits=100, decimal_places=2, null=True, blank=True)
+    # Supplier/ERP identifier used to match rows in catalog imports
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    # Maintained by signals from name, description, category and details (see utils/search.py)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
     
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Backs the newest-first listing and its keyset cursor
+            models.Index(fields=["-created_at", "-id"], name="product_created_id_idx"),
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
+            # Trigram index for typo-tolerant autocomplete (requires pg_trgm)
+            GinIndex(fields=["product_name"], name="product_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
+    
     def __str__(self) -> str:
         return self.product_name
     
@@ -78,7 +109,7 @@ class ProductDiscount(models.Model):
     discount_type = models.CharField(max_length=100, null=True, blank=True)
             
 class Coupon(models.Model):
-    coupon_code = models.CharField(max_length=100, null=True, blank=True)
+    coupon_code = models.CharField(max_length=100, unique=True, null=True, blank=True)
     coupon_discount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     coupon_start_date = models.DateField(null=True, blank=True)
     coupon_end_date = models.DateField(null=True, blank=True)
@@ -86,4 +117,164 @@ class Coupon(models.Model):
     
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
-        
\ No newline at end of file
+
+
+class ProductSnapshot(models.Model):
+    """
+    Read model for the catalog: the fully rendered product document plus the
+    columns the listings filter and sort on. Maintained from the tables above
+    by signals (see utils/snapshots.py); never edit it directly.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    category_name = models.CharField(max_length=100, null=True, blank=True)
+    meatcuts = ArrayField(models.CharField(max_length=100), default=list, blank=True)
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Unrated products sort as 0, after every rated one
+    rating = models.DecimalField(max_digits=100, decimal_places=2, default=0)
+    document = models.JSONField(encoder=DjangoJSONEncoder)
+    # Next discount start/end after the last render, when the document goes stale
+    valid_until = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-product"], name="snapshot_created_idx"),
+            models.Index(fields=["category", "-created_at", "-product"], name="snapshot_category_created_idx"),
+            # Category listings sorted by price: the same expressions as
+            # pricing.with_price_rank (unpriced products last either way), so the
+            # planner can walk them, backwards for the descending sort
+            models.Index(
+                F("category"),
+                Coalesce(F("effective_price"), Value(Decimal("99999999.99"))),
+                F("product"),
+                name="snapshot_cat_price_asc_idx",
+            ),
+            models.Index(
+                F("category"),
+                Coalesce(F("effective_price"), Value(Decimal("-1"))),
+                F("product"),
+                name="snapshot_cat_price_desc_idx",
+            ),
+            models.Index(fields=["category", "-rating", "-product"], name="snapshot_cat_rating_idx"),
+            GinIndex(fields=["meatcuts"], name="snapshot_meatcuts_idx"),
+            models.Index(fields=["valid_until"], name="snapshot_valid_until_idx"),
+        ]
+
+
+# Invalidate cached catalog responses whenever catalog data changes
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from HCProduct.utils.catalog_cache import bump_catalog_version
+from HCProduct.utils.signals import catalog_signals_muted
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=productDetails)
+@receiver([post_save, post_delete], sender=ProductVariant)
+@receiver([post_save, post_delete], sender=ProductDiscount)
+def invalidate_catalog_cache(sender, **kwargs):
+    if catalog_signals_muted():
+        return
+    bump_catalog_version()
+
+
+# Keep product search vectors in sync with the text they are built from
+from HCProduct.utils.search import PRODUCT_SEARCH_FIELDS, refresh_search_vectors
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_vector(sender, instance: Product, update_fields=None, **kwargs):
+    if update_fields and not PRODUCT_SEARCH_FIELDS.intersection(update_fields):
+        return
+    refresh_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=productDetails)
+def refresh_details_search_vector(sender, instance: productDetails, **kwargs):
+    if catalog_signals_muted():
+        return
+    refresh_search_vectors(Product.objects.filter(pk=instance.product_id))
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_search_vectors(sender, instance: Category, **kwargs):
+    refresh_search_vectors(Product.objects.filter(product_category=instance))
+
+
+# Re-render catalog snapshots for every product whose card data changed
+from HCProduct.utils.snapshots import schedule_snapshot_rebuild
+
+
+@receiver(post_save, sender=Product)
+def rebuild_product_snapshot(sender, instance: Product, **kwargs):
+    schedule_snapshot_rebuild([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=productDetails)
+@receiver([post_save, post_delete], sender=ProductDiscount)
+def rebuild_related_product_snapshot(sender, instance, **kwargs):
+    if catalog_signals_muted():
+        return
+    schedule_snapshot_rebuild([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+def rebuild_category_snapshots(sender, instance: Category, **kwargs):
+    schedule_snapshot_rebuild(Product.objects.filter(product_category=instance).values_list("pk", flat=True))
+
+
+# Drop the per-worker category tables everywhere
+from HCProduct.utils.category_cache import invalidate_category_cache
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, **kwargs):
+    invalidate_category_cache()
+
+
+# Coupon lookups are cached briefly; drop them as soon as a coupon changes
+from HCProduct.utils.coupons import forget_coupon
+
+
+@receiver(pre_save, sender=Coupon)
+def forget_renamed_coupon(sender, instance: Coupon, **kwargs):
+    if instance.pk is not None:
+        forget_coupon(Coupon.objects.filter(pk=instance.pk).values_list("coupon_code", flat=True).first())
+
+
+@receiver([post_save, post_delete], sender=Coupon)
+def forget_changed_coupon(sender, instance: Coupon, **kwargs):
+    forget_coupon(instance.coupon_code)
+
+
+# Forget cached URLs (and renditions) of product and category images that are replaced or removed
+from django.db import transaction
+from HCProduct.utils.image_urls import forget_image_url
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Category)
+def forget_replaced_image_url(sender, instance, update_fields=None, **kwargs):
+    field = "product_image" if sender is Product else "category_image"
+    if instance.pk is None or (update_fields and field not in update_fields):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+    current = getattr(instance, field).name or None
+    if previous != current:
+        # Renditions belong to the previous image; the new upload queues its own
+        setattr(instance, f"{field}_renditions", {})
+    if previous and previous != current:
+        transaction.on_commit(lambda: forget_image_url(previous))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def forget_deleted_image_url(sender, instance, **kwargs):
+    image = instance.product_image if sender is Product else instance.category_image
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: forget_image_url(name))
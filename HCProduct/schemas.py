@@ -1,5 +1,5 @@
 from ninja import Schema
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 
 
@@ -62,4 +62,27 @@ class CouponSchema(Schema):
     coupon_discount: Optional[float]
     coupon_start_date: Optional[date]
     coupon_end_date: Optional[date]
-    coupon_is_expired: Optional[bool] = False
\ No newline at end of file
+    coupon_is_expired: Optional[bool] = False
+
+class CouponValidateSchema(Schema):
+    coupon_code: str
+
+class ImageUploadRequestSchema(Schema):
+    target: str  # "products" or "categories"
+    filename: str
+    content_type: str
+
+
+class ImageUploadConfirmSchema(Schema):
+    key: str  # Storage key returned by the presign endpoint
+
+
+class BatchOperationSchema(Schema):
+    op: str  # "create", "update" or "delete"
+    id: Optional[int] = None  # Required for update / delete
+    product_id: Optional[int] = None  # Required for create
+    data: dict = {}  # Field values for create / update
+
+
+class BatchOperationsSchema(Schema):
+    operations: List[BatchOperationSchema]
@@ -1,3 +1,420 @@
-from django.test import TestCase
+import base64
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from botocore.stub import Stubber
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage, storages
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from ninja_jwt.tokens import AccessToken
+from PIL import Image
+
+from HCUser.models import HomeChoiceUser
+
+from HCCart.models import Cart, CartItem
+from HCProduct.models import Category, Coupon, Product, ProductDiscount, ProductSnapshot, ProductVariant
+from HCProduct.utils.catalog_cache import get_catalog_version
+from HCProduct.utils.category_cache import local_categories
+from HCProduct.utils.renditions import available_formats, generate_renditions, render_image, rendition_name
+
+
+def _cursor(ordering, values):
+    raw = json.dumps({"o": ordering, "v": values}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        # Cached pages, versions and the category table would leak between tests
+        caches["default"].clear()
+        local_categories.clear()
+
+    def auth_headers(self, is_staff=True):
+        """
+        Bearer token of a new (staff) user, for the JWT-protected endpoints.
+        """
+        number = HomeChoiceUser.objects.count()
+        user = HomeChoiceUser.objects.create(
+            username=f"user{number}", email=f"user{number}@example.com", is_staff=is_staff
+        )
+        return {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(user)}"}
+
+    def make_product(self, **fields):
+        """
+        Create a product (and its category) with the on-commit snapshot rebuild run.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.get_or_create(category_name="Beef")[0]
+            fields.setdefault("product_price", Decimal("100.00"))
+            return Product.objects.create(product_name="Ribeye", product_category=category, **fields)
+
+
+class CursorValidationTests(CatalogTestCase):
+    def test_malformed_cursor_values_are_rejected(self):
+        cursors = [
+            ("newest", ["-created_at", "-pk"], ["garbage", 1]),
+            ("newest", ["-created_at", "-pk"], ["2024-01-01T00:00:00+00:00", "x"]),
+            ("price_asc", ["price_rank", "pk"], ["NaN", 1]),
+            ("price_asc", ["price_rank", "pk"], [None, 1]),
+            ("rating", ["-rating", "-pk"], [[1], 1]),
+        ]
+        for sort, ordering, values in cursors:
+            with self.subTest(values=values):
+                response = self.client.get(
+                    "/productapi/api/products", {"sort": sort, "cursor": _cursor(ordering, values)}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_valid_cursor_is_accepted(self):
+        cursor = _cursor(["-created_at", "-pk"], ["2024-01-01T00:00:00+00:00", 5])
+        response = self.client.get("/productapi/api/products", {"cursor": cursor})
+        self.assertEqual(response.status_code, 200)
+
+
+class ProductDiscountPayloadTests(CatalogTestCase):
+    def test_detail_carries_the_active_discount_not_the_history(self):
+        product = self.make_product()
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            expired = ProductDiscount.objects.create(
+                product=product, discount_percentage=10, discount_end_date=now - timedelta(days=1)
+            )
+            active = ProductDiscount.objects.create(
+                product=product, discount_percentage=20, discount_end_date=now + timedelta(days=1)
+            )
+
+        data = self.client.get(f"/productapi/api/products/{product.pk}").json()["data"]
+        self.assertNotIn("discounts", data)
+        self.assertEqual(data["active_discount"]["id"], active.pk)
+        self.assertEqual(Decimal(data["effective_price"]), Decimal("80.00"))
+
+        history = self.client.get(f"/productapi/api/products/{product.pk}/discounts").json()["discounts"]
+        self.assertEqual([discount["id"] for discount in history], [expired.pk, active.pk])
+
+
+class CouponCreateTests(CatalogTestCase):
+    def create(self, code):
+        return self.client.post(
+            "/productapi/api/coupons",
+            {"coupon_code": code, "coupon_discount": 10, "coupon_start_date": None, "coupon_end_date": None},
+            content_type="application/json",
+        )
+
+    def test_duplicate_code_is_rejected(self):
+        self.assertEqual(self.create("SUMMER").status_code, 200)
+        response = self.create("SUMMER")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()["success"])
+        self.assertEqual(Coupon.objects.filter(coupon_code="SUMMER").count(), 1)
+
+    def test_blank_codes_do_not_collide(self):
+        for code in ("", ""):
+            self.assertEqual(self.create(code).status_code, 200)
+        self.assertEqual(Coupon.objects.filter(coupon_code__isnull=True).count(), 2)
+
+
+class ETagTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.make_product()
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertTrue(etag)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        return etag
+
+    def test_products(self):
+        self.assert_revalidates("/productapi/api/products")
+
+    def test_product(self):
+        self.assert_revalidates(f"/productapi/api/products/{self.product.pk}")
+
+    def test_categories(self):
+        self.assert_revalidates("/productapi/api/categories")
+
+    def test_category_products(self):
+        self.assert_revalidates("/productapi/api/products/category/beef")
+
+    def test_expired_snapshot_is_not_revalidated(self):
+        url = f"/productapi/api/products/{self.product.pk}"
+        etag = self.assert_revalidates(url)
+        # A discount window opened since the snapshot was rendered (bulk_create
+        # skips the signals, as the passing of time would)
+        ProductDiscount.objects.bulk_create([ProductDiscount(product=self.product, discount_percentage=Decimal("10"))])
+        ProductSnapshot.objects.filter(product=self.product).update(valid_until=timezone.now() - timedelta(minutes=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["effective_price"], "90.00")
+
+    def test_stale_snapshots_are_rendered_without_writing(self):
+        ProductDiscount.objects.bulk_create([ProductDiscount(product=self.product, discount_percentage=Decimal("10"))])
+        ProductSnapshot.objects.filter(product=self.product).update(valid_until=timezone.now() - timedelta(minutes=1))
+        version = get_catalog_version()
+
+        urls = [
+            f"/productapi/api/products/{self.product.pk}",
+            f"/productapi/api/products/batch?ids={self.product.pk}",
+            "/productapi/api/products",
+        ]
+        for url in urls:
+            with self.subTest(url=url), self.captureOnCommitCallbacks(execute=True) as callbacks:
+                data = self.client.get(url).json()["data"]
+                document = data if isinstance(data, dict) else data[0]
+                self.assertEqual(document["effective_price"], "90.00")
+            self.assertEqual(callbacks, [])
+        # Saving the re-rendered row is left to the sweeper
+        snapshot = ProductSnapshot.objects.get(product=self.product)
+        self.assertEqual(snapshot.document["effective_price"], "100.00")
+        self.assertEqual(get_catalog_version(), version)
+
+    def test_catalog_write_changes_the_etag(self):
+        url = f"/productapi/api/products/{self.product.pk}"
+        etag = self.assert_revalidates(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.product_price = Decimal("90.00")
+            self.product.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["data"]["product_price"], "90.00")
+
+
+class FileSystemStorageTestCase(CatalogTestCase):
+    """
+    Runs against a FileSystemStorage in a temporary MEDIA_ROOT instead of S3.
+    """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        storage = override_settings(
+            MEDIA_ROOT=media_root,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def save_image(self, name, size, mode="RGB"):
+        buffer = BytesIO()
+        Image.new(mode, size, "red").save(buffer, "PNG")
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+@override_settings(IMAGE_RENDITION_WIDTHS=[200, 400, 800])
+class RenditionTests(FileSystemStorageTestCase):
+    def test_rendition_names_are_deterministic(self):
+        self.assertEqual(
+            rendition_name("products/7/abc_steak.png", 400, "webp"), "renditions/products/7/abc_steak/400w.webp"
+        )
+
+    def test_renders_every_width_and_format(self):
+        name = self.save_image("products/1/steak.png", (1000, 500))
+        renditions = render_image(name)
+
+        self.assertEqual(set(renditions), set(available_formats()))
+        self.assertIn("jpeg", renditions)
+        for extension, widths in renditions.items():
+            self.assertEqual(set(widths), {"200", "400", "800"})
+            for width, rendition in widths.items():
+                self.assertEqual(rendition, rendition_name(name, width, extension))
+                with default_storage.open(rendition, "rb") as stored:
+                    image = Image.open(stored)
+                    self.assertEqual(image.size, (int(width), int(width) // 2))
+
+    def test_rerender_replaces_the_same_keys(self):
+        name = self.save_image("products/1/steak.png", (1000, 500))
+        self.assertEqual(render_image(name), render_image(name))
+
+    def test_small_images_are_not_upscaled(self):
+        name = self.save_image("products/1/small.png", (300, 100), mode="RGBA")
+        renditions = render_image(name)
+        self.assertEqual(set(renditions["jpeg"]), {"200", "300"})
+        with default_storage.open(renditions["jpeg"]["300"], "rb") as stored:
+            self.assertEqual(Image.open(stored).size, (300, 100))
+
+    def test_generate_renditions_updates_the_snapshot(self):
+        product = self.make_product()
+        name = self.save_image("products/1/steak.png", (1000, 500))
+        # update() keeps the background rendition queue out of the test
+        Product.objects.filter(pk=product.pk).update(product_image=name)
+        product.refresh_from_db()
+
+        renditions = generate_renditions(product)
+        product.refresh_from_db()
+        self.assertEqual(product.product_image_renditions, renditions)
+        document = ProductSnapshot.objects.get(product=product).document
+        self.assertEqual(document["product_image_variants"], renditions)
+
+
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "storages.backends.s3boto3.S3Boto3Storage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+)
+class DirectUploadTests(CatalogTestCase):
+    """
+    Presign, then confirm, with the S3 client stubbed: presigning is signed
+    locally and the only S3 call, head_object, is answered by the stubber.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.make_product()
+        self.client.force_login(HomeChoiceUser.objects.create(username="uploader", email="uploader@example.com"))
+        storage = storages["default"]
+        self.bucket = storage.bucket_name
+        self.s3 = Stubber(storage.connection.meta.client)
+        self.s3.activate()
+        self.addCleanup(self.s3.deactivate)
+
+    def presign(self, target="products", content_type="image/png"):
+        return self.client.post(
+            "/productapi/api/uploads/images/presign",
+            {"target": target, "filename": "../My Steak.png", "content_type": content_type},
+            content_type="application/json",
+        )
+
+    def confirm(self, key, url=None):
+        return self.client.post(
+            url or f"/productapi/api/products/{self.product.pk}/image/confirm",
+            {"key": key},
+            content_type="application/json",
+        )
+
+    def expect_head(self, key, **response):
+        self.s3.add_response("head_object", response, {"Bucket": self.bucket, "Key": key})
+
+    def test_presign_then_confirm(self):
+        response = self.presign()
+        self.assertEqual(response.status_code, 200)
+        upload = response.json()["data"]
+        key = upload["key"]
+        self.assertRegex(key, r"^products/\d+/[0-9a-f-]{36}_My_Steak\.png$")
+        self.assertEqual(upload["fields"]["key"], key)
+        self.assertEqual(upload["fields"]["Content-Type"], "image/png")
+        self.assertIn(self.bucket, upload["url"])
+
+        self.s3.add_client_error("head_object", service_error_code="404", http_status_code=404)
+        self.assertEqual(self.confirm(key).status_code, 409)
+
+        self.expect_head(key, ContentType="image/png", ContentLength=1024)
+        response = self.confirm(key)
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.product_image.name, key)
+
+        # The reservation is consumed by the first confirm
+        self.assertEqual(self.confirm(key).status_code, 400)
+        self.s3.assert_no_pending_responses()
+
+    def test_confirm_rejects_other_targets_and_unknown_keys(self):
+        key = self.presign().json()["data"]["key"]
+        category = Category.objects.get(category_name="Beef")
+        self.assertEqual(self.confirm(key, f"/productapi/api/categories/{category.pk}/image/confirm").status_code, 400)
+        self.assertEqual(self.confirm("products/1/not-issued.png").status_code, 400)
+
+    def test_confirm_rejects_non_images(self):
+        key = self.presign().json()["data"]["key"]
+        self.expect_head(key, ContentType="text/html", ContentLength=10)
+        self.assertEqual(self.confirm(key).status_code, 400)
+
+    def test_presign_rejects_unsupported_types(self):
+        self.assertEqual(self.presign(content_type="text/html").status_code, 400)
+        self.assertEqual(self.presign(target="orders").status_code, 400)
+
+
+class BulkWriteAccessTests(CatalogTestCase):
+    URLS = [
+        "/productapi/api/product/details/batch",
+        "/productapi/api/product/discounts/batch",
+        "/productapi/api/product/variants/batch",
+    ]
+
+    def post(self, url, **headers):
+        return self.client.post(url, {"operations": []}, content_type="application/json", **headers)
+
+    def test_batch_endpoints_are_staff_only(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.post(url).status_code, 401)
+                self.assertEqual(self.post(url, **self.auth_headers(is_staff=False)).status_code, 403)
+                # Past the access check: rejected for having no operations
+                self.assertEqual(self.post(url, **self.auth_headers()).status_code, 400)
+
+    def test_import_is_staff_only(self):
+        url = "/productapi/api/products/import"
+        for headers, status in (({}, 401), (self.auth_headers(is_staff=False), 403)):
+            file = ContentFile(b"product_name\nRibeye\n", name="products.csv")
+            self.assertEqual(self.client.post(url, {"file": file}, **headers).status_code, status)
+        self.assertEqual(Product.objects.count(), 0)
+
+
+class CatalogBatchDeleteTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.make_product()
+        self.headers = self.auth_headers()
+
+    def batch(self, resource, operations):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                f"/productapi/api/product/{resource}/batch",
+                {"operations": operations},
+                content_type="application/json",
+                **self.headers,
+            )
+        self.assertEqual(response.status_code, 200)
+        return callbacks
+
+    def test_discount_deletes_refresh_once(self):
+        discounts = ProductDiscount.objects.bulk_create(
+            [ProductDiscount(product=self.product, discount_percentage=Decimal(10 + i)) for i in range(3)]
+        )
+        ProductSnapshot.objects.filter(product=self.product).update(effective_price=Decimal("1.00"))
+        version = get_catalog_version()
+
+        callbacks = self.batch("discounts", [{"op": "delete", "id": discount.pk} for discount in discounts])
+
+        # One catalog version bump for the batch, no per-row snapshot rebuilds
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_catalog_version(), version + 1)
+        self.assertFalse(ProductDiscount.objects.exists())
+        self.assertEqual(ProductSnapshot.objects.get(product=self.product).effective_price, Decimal("100.00"))
+
+    def test_variant_deletes_cascade_to_cart_lines(self):
+        variants = ProductVariant.objects.bulk_create(
+            [ProductVariant(product=self.product, product_variant_name=f"{i}kg") for i in range(1, 3)]
+        )
+        user = HomeChoiceUser.objects.create(username="shopper", email="shopper@example.com")
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, variant=variants[0], quantity=2)
+
+        callbacks = self.batch("variants", [{"op": "delete", "id": variant.pk} for variant in variants])
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(ProductVariant.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
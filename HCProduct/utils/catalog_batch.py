@@ -0,0 +1,174 @@
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from HCProduct.models import Product, ProductDiscount, ProductVariant, productDetails
+from HCProduct.utils.catalog_cache import bump_catalog_version
+from HCProduct.utils.catalog_import import DETAILS_COLUMNS, DISCOUNT_COLUMNS, VARIANT_COLUMNS
+from HCProduct.utils.search import refresh_search_vectors
+from HCProduct.utils.signals import mute_catalog_signals
+from HCProduct.utils.snapshots import rebuild_snapshots
+
+# Fields each batch endpoint may write, same set as the importer's columns
+BATCH_FIELDS = {
+    ProductVariant: tuple(VARIANT_COLUMNS.values()),
+    productDetails: tuple(DETAILS_COLUMNS.values()),
+    ProductDiscount: tuple(DISCOUNT_COLUMNS.values()),
+}
+BATCH_OPERATIONS = ("create", "update", "delete")
+MAX_BATCH_OPERATIONS = 1000
+
+
+class BatchItemError(ValueError):
+    pass
+
+
+class CatalogBatch:
+    """
+    Apply create/update/delete operations to one child model of Product
+    (variants, details or discounts) in a single transaction.
+
+    Operations are validated first; if any fails, nothing is written. Writes
+    use one bulk_create, one bulk_update over the changed fields only and one
+    queryset delete. Bulk writes skip model signals and the delete runs with
+    them muted, so the affected snapshots, search vectors and the catalog
+    version are refreshed once for the whole batch.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = BATCH_FIELDS[model]
+        self.results = []
+
+    def _clean(self, data, instance):
+        values = {}
+        for name, value in (data or {}).items():
+            if name not in self.fields:
+                raise BatchItemError(f"Unknown field '{name}'.")
+            try:
+                value = self.model._meta.get_field(name).clean(value, instance)
+            except (FieldDoesNotExist, ValidationError) as e:
+                messages = getattr(e, "messages", [str(e)])
+                raise BatchItemError(f"{name}: {' '.join(messages)}")
+            if isinstance(value, datetime) and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            values[name] = value
+        return values
+
+    def _result(self, index, operation, status, instance_id=None, message=None):
+        result = {"index": index, "op": operation.op, "id": instance_id, "status": status}
+        if message:
+            result["message"] = message
+        return result
+
+    def run(self, operations):
+        """
+        Return `(success, results)` with one result per operation, in order.
+        """
+        self.results = []
+        with transaction.atomic():
+            existing = self.model.objects.select_for_update().in_bulk(
+                {operation.id for operation in operations if operation.op != "create" and operation.id}
+            )
+            product_names = dict(
+                Product.objects.filter(
+                    pk__in={operation.product_id for operation in operations if operation.op == "create"} - {None}
+                ).values_list("pk", "product_name")
+            )
+
+            new, changed, deleted, update_fields = [], {}, {}, set()
+            failed = False
+            for index, operation in enumerate(operations):
+                try:
+                    status, instance = self._plan(operation, existing, product_names, changed, deleted, update_fields)
+                except BatchItemError as e:
+                    failed = True
+                    self.results.append(self._result(index, operation, "error", operation.id, str(e)))
+                    continue
+                if status == "created":
+                    new.append((index, instance))
+                self.results.append(self._result(index, operation, status, instance.pk))
+
+            if failed:
+                # Nothing has been written yet; report every item as not applied
+                for result in self.results:
+                    if result["status"] != "error":
+                        result["status"] = "skipped"
+                return False, self.results
+
+            self._write(new, changed, deleted, update_fields)
+        return True, self.results
+
+    def _plan(self, operation, existing, product_names, changed, deleted, update_fields):
+        if operation.op not in BATCH_OPERATIONS:
+            raise BatchItemError(f"op must be one of: {', '.join(BATCH_OPERATIONS)}.")
+
+        if operation.op == "create":
+            if operation.product_id not in product_names:
+                raise BatchItemError("product_id is missing or does not exist.")
+            instance = self.model(product_id=operation.product_id)
+            for field, value in self._clean(operation.data, instance).items():
+                setattr(instance, field, value)
+            if self.model is ProductVariant and not instance.product_variant_name:
+                # Mirrors ProductVariant.save(), which bulk_create skips
+                instance.product_variant_name = slugify(product_names[operation.product_id])
+            return "created", instance
+
+        instance = existing.get(operation.id)
+        if instance is None:
+            raise BatchItemError("id is missing or does not exist.")
+        if instance.pk in deleted:
+            raise BatchItemError("Already deleted earlier in this batch.")
+
+        if operation.op == "delete":
+            deleted[instance.pk] = instance
+            changed.pop(instance.pk, None)
+            return "deleted", instance
+
+        values = self._clean(operation.data, instance)
+        dirty = {field for field, value in values.items() if getattr(instance, field) != value}
+        if not dirty:
+            return "unchanged", instance
+        for field in dirty:
+            setattr(instance, field, values[field])
+        update_fields.update(dirty)
+        changed[instance.pk] = instance
+        return "updated", instance
+
+    def _write(self, new, changed, deleted, update_fields):
+        if new:
+            self.model.objects.bulk_create([instance for _, instance in new])
+            for index, instance in new:
+                self.results[index]["id"] = instance.pk
+
+        if changed:
+            if self.model is ProductVariant:
+                # auto_now is only applied by save()
+                now = timezone.now()
+                for instance in changed.values():
+                    instance.updated_at = now
+                update_fields.add("updated_at")
+            self.model.objects.bulk_update(changed.values(), sorted(update_fields))
+
+        if deleted:
+            # Cascades (e.g. variants to cart lines) as usual; the per-row
+            # refreshes are replaced by the batch-wide ones below
+            with mute_catalog_signals():
+                self.model.objects.filter(pk__in=list(deleted)).delete()
+
+        product_ids = {instance.product_id for _, instance in new}
+        product_ids.update(instance.product_id for instance in changed.values())
+        product_ids.update(instance.product_id for instance in deleted.values())
+        if not product_ids:
+            return
+        if self.model is productDetails:
+            refresh_search_vectors(Product.objects.filter(pk__in=product_ids))
+        if self.model is ProductVariant:
+            # Variants are not part of the snapshot documents
+            bump_catalog_version()
+        else:
+            # Also bumps the catalog version, once
+            rebuild_snapshots(product_ids)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+
+# Use Django Redis cache
+catalog_cache = caches["default"]
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+# Browsers always revalidate (cheap with ETags); shared caches keep 60s and may
+# serve stale for 5 minutes while revalidating
+CATALOG_CACHE_CONTROL = "public, max-age=0, s-maxage=60, stale-while-revalidate=300"
+
+
+def _seed_version():
+    """
+    Seed for a missing version key. Milliseconds since the epoch are always
+    ahead of any version handed out before the key was lost, so stale entries
+    can never be read back after an eviction.
+    """
+    return time.time_ns() // 1_000_000
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version, creating it if it does not exist yet.
+    """
+    version = catalog_cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        catalog_cache.add(CATALOG_VERSION_KEY, _seed_version(), timeout=None)
+        version = catalog_cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def _incr_catalog_version():
+    try:
+        catalog_cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        catalog_cache.add(CATALOG_VERSION_KEY, _seed_version(), timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog response by moving to a new version.
+    Deferred until commit so readers never cache pre-commit data under the new version.
+    """
+    transaction.on_commit(_incr_catalog_version)
+
+
+def catalog_cache_key(namespace, *parts):
+    """
+    Build a cache key scoped to the current catalog version.
+    """
+    digest = hashlib.md5(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+    return f"catalog:{namespace}:v{get_catalog_version()}:{digest}"
+
+
+def cache_catalog_payload(cache_key, payload):
+    catalog_cache.set(cache_key, payload, timeout=settings.CATALOG_CACHE_TIMEOUT)
+
+
+def catalog_etag(cache_key):
+    """
+    Strong ETag for the response identified by a `catalog_cache_key`. The key
+    embeds the catalog version, so the tag changes with every catalog write.
+    With signed image URLs it also changes whenever those URLs are re-signed.
+    """
+    # Imported here: image_urls builds on this module
+    from HCProduct.utils.image_urls import image_url_epoch
+
+    tag_source = f"{cache_key}:{image_url_epoch()}"
+    return '"%s"' % hashlib.md5(tag_source.encode("utf-8")).hexdigest()
+
+
+def not_modified_response(request, etag):
+    """
+    Return a 304 when the request's If-None-Match already holds `etag`, else None.
+    Call it before building the body so revalidations cost no queries.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+        response["Cache-Control"] = CATALOG_CACHE_CONTROL
+    return response
+
+
+def catalog_response(payload, etag=None):
+    response = JsonResponse(payload)
+    response["Cache-Control"] = CATALOG_CACHE_CONTROL
+    if etag:
+        response["ETag"] = etag
+    return response
+
+
+class LocalLRUCache:
+    """
+    Small thread-safe in-process LRU. Each gunicorn worker holds its own copy,
+    so callers must scope keys (e.g. by catalog version) to stay consistent.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
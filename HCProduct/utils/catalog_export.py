@@ -0,0 +1,141 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from HCProduct.models import Product, ProductVariant, productDetails
+from HCProduct.utils.catalog_import import DETAILS_COLUMNS, DISCOUNT_COLUMNS, PRODUCT_COLUMNS, VARIANT_COLUMNS
+from HCProduct.utils.pricing import active_discount_map, apply_discount
+
+# CSV columns use the import names, so an export can be edited and re-imported.
+# One row per variant (or one row for a product without variants).
+CSV_COLUMNS = [
+    "id",
+    "external_id",
+    "category",
+    *PRODUCT_COLUMNS,
+    "effective_price",
+    *DETAILS_COLUMNS,
+    *VARIANT_COLUMNS,
+    *DISCOUNT_COLUMNS,
+]
+
+
+class _Echo:
+    # csv.writer target that hands each formatted row straight back
+    def write(self, value):
+        return value
+
+
+def export_queryset():
+    """
+    Product rows as dicts with the category name, ready for `stream_csv` /
+    `stream_ndjson`. Plain values, not model instances: instantiation would
+    dominate the cost of a full-catalog export.
+    """
+    return (
+        Product.objects.order_by("pk")
+        .values("id", "external_id", *PRODUCT_COLUMNS.values(), category=F("product_category__category_name"))
+    )
+
+
+def _children(model, fields, product_ids):
+    """
+    {product_id: [row, ...]} for one chunk of products, in id order.
+    """
+    grouped = {}
+    for row in model.objects.filter(product_id__in=product_ids).order_by("product_id", "id").values(
+        "id", "product_id", *fields
+    ):
+        grouped.setdefault(row["product_id"], []).append(row)
+    return grouped
+
+
+def _chunks(products, chunk_size):
+    """
+    Yield (products, details, variants) per chunk: one server-side cursor for
+    the products plus three queries per chunk for their relations. Each product
+    gets its `effective_price` and `active_discount` filled in.
+    """
+    at = timezone.now()
+    chunk = []
+    for product in products.iterator(chunk_size=chunk_size):
+        chunk.append(product)
+        if len(chunk) >= chunk_size:
+            yield chunk, *_relations(chunk, at)
+            chunk = []
+    if chunk:
+        yield chunk, *_relations(chunk, at)
+
+
+def _relations(chunk, at):
+    product_ids = [product["id"] for product in chunk]
+    discounts = active_discount_map(product_ids, at)
+    for product in chunk:
+        discount = discounts.get(product["id"])
+        product["active_discount"] = (
+            {field: discount[field] for field in DISCOUNT_COLUMNS.values()} if discount else None
+        )
+        product["effective_price"] = apply_discount(
+            product["product_price"], discount["discount_percentage"] if discount else None
+        )
+    return (
+        _children(productDetails, DETAILS_COLUMNS.values(), product_ids),
+        _children(ProductVariant, VARIANT_COLUMNS.values(), product_ids),
+    )
+
+
+def stream_csv(products, chunk_size=2000):
+    """
+    CSV in the import format: one row per variant, or one row for a product
+    without variants; the first details row and the active discount repeat.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for chunk, details, variants in _chunks(products, chunk_size):
+        lines = []
+        for product in chunk:
+            base = {"id": product["id"], "external_id": product["external_id"], "category": product["category"]}
+            base.update((column, product[field]) for column, field in PRODUCT_COLUMNS.items())
+            base["effective_price"] = product["effective_price"]
+            product_details = details.get(product["id"])
+            if product_details:
+                base.update((column, product_details[0][field]) for column, field in DETAILS_COLUMNS.items())
+            discount = product["active_discount"]
+            if discount:
+                base.update((column, discount[field]) for column, field in DISCOUNT_COLUMNS.items())
+            for variant in variants.get(product["id"]) or [None]:
+                row = dict(base)
+                if variant is not None:
+                    row.update((column, variant[field]) for column, field in VARIANT_COLUMNS.items())
+                lines.append(writer.writerow([row.get(column) for column in CSV_COLUMNS]))
+        # One write per chunk keeps the response fast without buffering the catalog
+        yield "".join(lines)
+
+
+def stream_ndjson(products, chunk_size=2000):
+    """
+    One JSON document per product with all of its details and variants.
+    """
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for chunk, details, variants in _chunks(products, chunk_size):
+        lines = []
+        for product in chunk:
+            document = {
+                "id": product["id"],
+                "external_id": product["external_id"],
+                "category": product["category"],
+                **{field: product[field] for field in PRODUCT_COLUMNS.values()},
+                "effective_price": product["effective_price"],
+                "active_discount": product["active_discount"],
+                "details": [
+                    {field: row[field] for field in DETAILS_COLUMNS.values()} for row in details.get(product["id"], ())
+                ],
+                "variants": [
+                    {"id": row["id"], **{field: row[field] for field in VARIANT_COLUMNS.values()}}
+                    for row in variants.get(product["id"], ())
+                ],
+            }
+            lines.append(encoder.encode(document) + "\n")
+        yield "".join(lines)
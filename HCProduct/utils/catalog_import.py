@@ -0,0 +1,356 @@
+import csv
+import io
+import json
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import slugify
+
+from HCProduct.models import Category, Product, ProductDiscount, ProductVariant, productDetails
+from HCProduct.utils.category_cache import invalidate_category_cache
+from HCProduct.utils.search import refresh_search_vectors
+from HCProduct.utils.snapshots import rebuild_snapshots
+
+# Row columns (CSV headers / JSONL keys) -> model field, per model. Only
+# columns present in a row are written, so partial files update partially.
+PRODUCT_COLUMNS = {
+    "product_name": "product_name",
+    "product_description": "product_description",
+    "product_price": "product_price",
+    "product_upcoming": "product_upcoming",
+}
+DETAILS_COLUMNS = {
+    "product_meatcut": "product_meatcut",
+    "product_weight": "product_weight",
+    "product_packaging": "product_packaging",
+    "product_origin": "product_origin",
+    "product_processing": "product_processing",
+}
+VARIANT_COLUMNS = {
+    "variant_name": "product_variant_name",
+    "variant_size": "product_variant_size",
+    "variant_price": "product_variant_price",
+    "variant_type": "product_variant_type",
+    "variant_order": "product_variant_order",
+}
+DISCOUNT_COLUMNS = {
+    "discount_code": "discount_code",
+    "discount_percentage": "discount_percentage",
+    "discount_start_date": "discount_start_date",
+    "discount_end_date": "discount_end_date",
+    "discount_type": "discount_type",
+}
+DECIMAL_FIELDS = {"product_price", "product_weight", "product_variant_price", "discount_percentage"}
+DATETIME_FIELDS = {"discount_start_date", "discount_end_date"}
+
+# Keep the report bounded however broken the file is
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def detect_format(filename, requested=None):
+    if requested:
+        if requested not in ("csv", "jsonl"):
+            raise ValueError("format must be 'csv' or 'jsonl'.")
+        return requested
+    return "jsonl" if (filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def iter_rows(stream, file_format):
+    """
+    Yield `(line_number, row_dict_or_error)` from a binary stream, one row at a time.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ImportRowError(f"Invalid JSON: {e}")
+            continue
+        yield line_number, row if isinstance(row, dict) else ImportRowError("Each line must be a JSON object.")
+
+
+def _convert(field, value):
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        return None
+    if field in DECIMAL_FIELDS:
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            raise ImportRowError(f"{field}: not a number ({value!r}).")
+    if field in DATETIME_FIELDS:
+        moment = parse_datetime(str(value))
+        if moment is None:
+            day = parse_date(str(value))
+            if day is None:
+                raise ImportRowError(f"{field}: not a date ({value!r}).")
+            moment = datetime.combine(day, time.min)
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+    if field == "product_upcoming":
+        return str(value).lower() in ("1", "true", "yes", "y")
+    if field == "product_variant_order":
+        try:
+            return int(value)
+        except ValueError:
+            raise ImportRowError(f"{field}: not an integer ({value!r}).")
+    return str(value)
+
+
+def _pick(row, columns):
+    values = {field: _convert(field, row[column]) for column, field in columns.items() if column in row}
+    return values if any(value is not None for value in values.values()) else None
+
+
+def parse_row(row):
+    """
+    Validate one input row into the per-model values the importer writes.
+    """
+    external_id = (str(row.get("external_id") or "")).strip() or None
+    product = {field: _convert(field, row[column]) for column, field in PRODUCT_COLUMNS.items() if column in row}
+    if not external_id and not product.get("product_name"):
+        raise ImportRowError("Each row needs an external_id or a product_name.")
+    variant = _pick(row, VARIANT_COLUMNS)
+    if variant and not variant.get("product_variant_name"):
+        raise ImportRowError("variant_name is required for variant columns.")
+    return {
+        "external_id": external_id,
+        "category": (str(row.get("category") or "")).strip() or None,
+        "product": product,
+        "details": _pick(row, DETAILS_COLUMNS),
+        "variant": variant,
+        "discount": _pick(row, DISCOUNT_COLUMNS),
+    }
+
+
+class CatalogImporter:
+    """
+    Upsert products and their details, variants and discounts from rows.
+
+    The import runs in one transaction with a savepoint per `chunk_size` rows,
+    so a chunk that fails in the database is reported and rolled back alone.
+    Products match by `external_id`, then by name within the row's category.
+    Only the current chunk is held in memory.
+    """
+
+    def __init__(self, chunk_size=500, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.rows = self.created = self.updated = 0
+        self.errors = []
+        self.error_count = 0
+        self._categories = {}  # slug -> id, grows with the number of categories only
+
+    def report(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "dry_run": self.dry_run,
+        }
+
+    def _error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "message": message})
+
+    def run(self, rows):
+        with transaction.atomic():
+            chunk = []
+            for line, raw in rows:
+                self.rows += 1
+                try:
+                    if isinstance(raw, Exception):
+                        raise raw
+                    chunk.append((line, parse_row(raw)))
+                except ImportRowError as e:
+                    self._error(line, str(e))
+                    continue
+                if len(chunk) >= self.chunk_size:
+                    self._flush(chunk)
+                    chunk = []
+            if chunk:
+                self._flush(chunk)
+            if self.dry_run:
+                transaction.set_rollback(True)
+        return self.report()
+
+    def _flush(self, chunk):
+        try:
+            with transaction.atomic():
+                created, updated = self._write(chunk)
+        except DatabaseError as e:
+            # Categories created in the rolled-back chunk are gone too
+            self._categories.clear()
+            for line, _ in chunk:
+                self._error(line, f"Chunk rolled back: {e}")
+            return
+        self.created += created
+        self.updated += updated
+
+    def _category_ids(self, names):
+        slugs = {slugify(name): name for name in names if name}
+        missing = {slug: name for slug, name in slugs.items() if slug not in self._categories}
+        if missing:
+            for category in Category.objects.filter(slug__in=missing):
+                self._categories[category.slug] = category.id
+            new = [
+                Category(category_name=name, slug=slug)
+                for slug, name in missing.items()
+                if slug not in self._categories
+            ]
+            # bulk_create skips Category.save() and its signals: slug is set
+            # above, and the category cache is invalidated here
+            for category in Category.objects.bulk_create(new):
+                self._categories[category.slug] = category.id
+            if new:
+                invalidate_category_cache()
+        return {name: self._categories[slug] for slug, name in slugs.items()}
+
+    def _match_products(self, chunk, category_ids):
+        """
+        Pair each row with its Product: by external_id first, then by name within
+        the row's category. Unmatched rows get a new, unsaved Product that later
+        rows in the chunk reuse.
+        """
+        external_ids = {row["external_id"] for _, row in chunk if row["external_id"]}
+        by_external = Product.objects.in_bulk(external_ids, field_name="external_id") if external_ids else {}
+        names = {row["product"].get("product_name") for _, row in chunk} - {None}
+        by_name = {}
+        for product in Product.objects.filter(product_name__in=names).order_by("-id"):
+            by_name[(product.product_name, product.product_category_id)] = product
+
+        matched = []
+        for _, row in chunk:
+            category_id = category_ids.get(row["category"])
+            name = row["product"].get("product_name")
+            product = by_external.get(row["external_id"])
+            if product is None and name:
+                product = by_name.get((name, category_id))
+            if product is None:
+                product = Product()
+            if row["external_id"]:
+                by_external[row["external_id"]] = product
+            if name:
+                by_name[(name, category_id)] = product
+            matched.append((row, category_id, product))
+        return matched
+
+    def _write(self, chunk):
+        now = timezone.now()
+        category_ids = self._category_ids({row["category"] for _, row in chunk})
+        matched = self._match_products(chunk, category_ids)
+
+        created = updated = 0
+        new_products, changed_products, update_fields = {}, {}, {"updated_at"}
+        for row, category_id, product in matched:
+            values = dict(row["product"])
+            if row["external_id"]:
+                values["external_id"] = row["external_id"]
+            if row["category"]:
+                values["product_category_id"] = category_id
+            for field, value in values.items():
+                if getattr(product, field) != value:
+                    setattr(product, field, value)
+                    update_fields.add("product_category" if field == "product_category_id" else field)
+            if product.pk is None:
+                if id(product) in new_products:
+                    updated += 1
+                else:
+                    new_products[id(product)] = product
+                    created += 1
+            else:
+                product.updated_at = now
+                changed_products[product.pk] = product
+                updated += 1
+
+        Product.objects.bulk_create(new_products.values())
+        if changed_products:
+            Product.objects.bulk_update(changed_products.values(), sorted(update_fields))
+
+        product_ids = {product.pk for _, _, product in matched}
+        self._write_details(matched, product_ids)
+        self._write_variants(matched, product_ids, now)
+        self._write_discounts(matched, product_ids)
+
+        # Bulk writes skip model signals: refresh derived data for the chunk
+        # (the snapshot rebuild also bumps the catalog version once)
+        refresh_search_vectors(Product.objects.filter(pk__in=product_ids))
+        rebuild_snapshots(product_ids)
+        return created, updated
+
+    def _upsert_children(self, model, rows, existing, extra_update_fields=()):
+        """
+        `rows` is [(key, product_id, values)], `existing` maps key -> instance.
+        """
+        new, changed, fields = {}, {}, set(extra_update_fields)
+        for key, product_id, values in rows:
+            instance = existing.get(key) or new.get(key)
+            if instance is None:
+                new[key] = instance = model(product_id=product_id)
+            for field, value in values.items():
+                if getattr(instance, field) != value:
+                    setattr(instance, field, value)
+                    fields.add(field)
+            if instance.pk is not None:
+                changed[instance.pk] = instance
+        model.objects.bulk_create(new.values())
+        if changed and fields:
+            model.objects.bulk_update(changed.values(), sorted(fields))
+
+    def _write_details(self, matched, product_ids):
+        rows = [(product.pk, product.pk, row["details"]) for row, _, product in matched if row["details"]]
+        if not rows:
+            return
+        # Mirrors PUT /products/{id}/details: the first detail row is the product's
+        existing = {}
+        for detail in productDetails.objects.filter(product_id__in=product_ids).order_by("-id"):
+            existing[detail.product_id] = detail
+        self._upsert_children(productDetails, rows, existing)
+
+    def _write_variants(self, matched, product_ids, now):
+        rows = [
+            ((product.pk, row["variant"]["product_variant_name"]), product.pk, row["variant"])
+            for row, _, product in matched
+            if row["variant"]
+        ]
+        if not rows:
+            return
+        existing = {
+            (variant.product_id, variant.product_variant_name): variant
+            for variant in ProductVariant.objects.filter(
+                product_id__in=product_ids, product_variant_name__in={key[1] for key, _, _ in rows}
+            )
+        }
+        for instance in existing.values():
+            instance.updated_at = now
+        self._upsert_children(ProductVariant, rows, existing, extra_update_fields=("updated_at",))
+
+    def _write_discounts(self, matched, product_ids):
+        rows = [
+            ((product.pk, row["discount"].get("discount_code")), product.pk, row["discount"])
+            for row, _, product in matched
+            if row["discount"]
+        ]
+        if not rows:
+            return
+        existing = {}
+        for discount in ProductDiscount.objects.filter(product_id__in=product_ids).order_by("-id"):
+            existing[(discount.product_id, discount.discount_code)] = discount
+        self._upsert_children(ProductDiscount, rows, existing)
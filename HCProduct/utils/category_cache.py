@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django_redis import get_redis_connection
+
+from HCProduct.utils.catalog_cache import _seed_version, catalog_cache, LocalLRUCache
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_VERSION_KEY = "categories:version"
+CATEGORY_CHANNEL = "categories:invalidate"
+
+# Categories change about once a month and the table is small, so each worker
+# keeps all of it: one entry, (version, rows), in an in-process LRU
+_TABLE = "table"
+local_categories = LocalLRUCache(maxsize=1)
+
+# Fields served from the cache; `category_image` is the storage name
+CATEGORY_FIELDS = (
+    "id",
+    "category_name",
+    "slug",
+    "category_image",
+    "category_image_renditions",
+    "created_at",
+    "updated_at",
+)
+
+
+class _Listener:
+    """
+    Per-process pub/sub subscriber that drops the local table whenever any
+    worker publishes an invalidation. While it is not connected, readers fall
+    back to checking the version key on every lookup.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.connected = threading.Event()
+        # Bumped on every local drop, so a load that raced one is not kept
+        self.generation = 0
+
+    def ensure_started(self):
+        # Started lazily, so gunicorn workers each get their own thread after fork
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.connected.clear()
+            threading.Thread(target=self._run, name="category-cache-listener", daemon=True).start()
+
+    def drop(self):
+        self.generation += 1
+        local_categories.clear()
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CATEGORY_CHANNEL)
+                # Anything published before the subscription took effect is unseen
+                self.drop()
+                self.connected.set()
+                backoff = 1
+                for _ in pubsub.listen():
+                    self.drop()
+            except Exception:
+                logger.warning("Category cache listener disconnected; retrying in %ss", backoff, exc_info=True)
+            self.connected.clear()
+            self.drop()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+_listener = _Listener()
+
+
+def get_category_version():
+    version = catalog_cache.get(CATEGORY_VERSION_KEY)
+    if version is None:
+        catalog_cache.add(CATEGORY_VERSION_KEY, _seed_version(), timeout=None)
+        version = catalog_cache.get(CATEGORY_VERSION_KEY)
+    return version
+
+
+def _table_key(version):
+    return f"categories:table:v{version}"
+
+
+def _load_rows():
+    # Imported here: the models module imports this one for its signals
+    from HCProduct.models import Category
+
+    rows = []
+    for row in Category.objects.order_by("id").values(*CATEGORY_FIELDS):
+        row["category_image"] = row["category_image"] or None
+        rows.append(row)
+    return rows
+
+
+def _index(version, rows):
+    return {
+        "version": version,
+        "rows": rows,
+        "by_id": {row["id"]: row for row in rows},
+        "by_slug": {row["slug"]: row for row in rows if row["slug"]},
+        "checked_at": time.monotonic(),
+    }
+
+
+def _fetch(version):
+    """
+    Redis tier: the table for `version`, loaded from Postgres on a miss.
+    """
+    key = _table_key(version)
+    rows = catalog_cache.get(key)
+    if rows is None:
+        rows = _load_rows()
+        catalog_cache.set(key, rows, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return rows
+
+
+def category_table():
+    """
+    The indexed category table. Served from worker memory without any network
+    round trip while the pub/sub listener is connected; the version key is still
+    re-checked every CATEGORY_CACHE_RECHECK seconds in case a message was lost.
+    """
+    _listener.ensure_started()
+    generation = _listener.generation
+    table = local_categories.get(_TABLE)
+    if table is not None:
+        fresh = time.monotonic() - table["checked_at"] < settings.CATEGORY_CACHE_RECHECK
+        if _listener.connected.is_set() and fresh:
+            return table
+        version = get_category_version()
+        if version == table["version"]:
+            table["checked_at"] = time.monotonic()
+            return table
+    else:
+        version = get_category_version()
+
+    table = _index(version, _fetch(version))
+    if _listener.generation == generation:
+        local_categories.set(_TABLE, table)
+    return table
+
+
+def get_categories():
+    return category_table()["rows"]
+
+
+def get_category(category_id=None, slug=None):
+    """
+    Cached category row by id or slug; raises Http404 like get_object_or_404.
+    """
+    table = category_table()
+    row = table["by_id"].get(category_id) if slug is None else table["by_slug"].get(slug)
+    if row is None:
+        raise Http404("No Category matches the given query.")
+    return row
+
+
+def _publish_invalidation():
+    try:
+        catalog_cache.incr(CATEGORY_VERSION_KEY)
+    except ValueError:
+        catalog_cache.add(CATEGORY_VERSION_KEY, _seed_version(), timeout=None)
+    _listener.drop()
+    get_redis_connection("default").publish(CATEGORY_CHANNEL, "1")
+
+
+def invalidate_category_cache():
+    """
+    Move every worker off the cached table once the current transaction commits.
+    Needed wherever categories are written without Category.save()/delete().
+    """
+    transaction.on_commit(_publish_invalidation)
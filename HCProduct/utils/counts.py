@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import connection
+
+from HCProduct.utils.catalog_cache import catalog_cache, catalog_cache_key, cache_catalog_payload
+
+
+def _planner_estimate(model):
+    """
+    Row estimate Postgres keeps for the table (refreshed by ANALYZE/autovacuum).
+    Returns None when unavailable, e.g. on other backends or before the first ANALYZE.
+    """
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        # Table names are mixed case (e.g. "HCProduct_product"), so quote them for regclass
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def count_products(qs, *filters, cache=True):
+    """
+    Return `(total, is_estimate)` for a filtered product queryset.
+
+    Counts are cached per filter combination under the catalog version (unless
+    `cache` is False). When no filter applies and the table is larger than
+    CATALOG_COUNT_ESTIMATE_THRESHOLD, the planner estimate is used instead of
+    a full COUNT(*).
+    """
+    cache_key = catalog_cache_key("product_count", *filters)
+    cached = catalog_cache.get(cache_key) if cache else None
+    if cached is not None:
+        return cached
+
+    result = None
+    threshold = settings.CATALOG_COUNT_ESTIMATE_THRESHOLD
+    if threshold and not any(filters):
+        estimate = _planner_estimate(qs.model)
+        if estimate is not None and estimate >= threshold:
+            result = (estimate, True)
+
+    if result is None:
+        result = (qs.count(), False)
+
+    if cache:
+        cache_catalog_payload(cache_key, result)
+    return result
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from HCProduct.models import Coupon
+from HCProduct.utils.catalog_cache import catalog_cache
+
+# Cached in place of a row for codes that do not exist, so guessing is cheap too
+_MISSING = "missing"
+
+COUPON_FIELDS = ("coupon_code", "coupon_discount", "coupon_start_date", "coupon_end_date", "coupon_is_expired")
+
+
+class CouponError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _cache_key(code):
+    return f"coupon:{hashlib.md5(code.encode('utf-8')).hexdigest()}"
+
+
+def lookup_coupon(code):
+    """
+    The coupon row for `code` as a dict, or None. Hits and misses are both
+    cached for COUPON_CACHE_TIMEOUT seconds.
+    """
+    key = _cache_key(code)
+    row = catalog_cache.get(key)
+    if row is None:
+        # Unique index on coupon_code
+        row = Coupon.objects.filter(coupon_code=code).values(*COUPON_FIELDS).first() or _MISSING
+        catalog_cache.set(key, row, timeout=settings.COUPON_CACHE_TIMEOUT)
+    return None if row == _MISSING else row
+
+
+def validate_coupon(code, today=None):
+    """
+    Return the coupon for `code` if it can be used today, else raise CouponError.
+    Dates are checked on every call, so a cached row never outlives its window.
+    """
+    code = (code or "").strip()
+    if not code:
+        raise CouponError("coupon_code is required.")
+    coupon = lookup_coupon(code)
+    if coupon is None:
+        raise CouponError("Invalid coupon code.", status=404)
+    today = today or timezone.localdate()
+    if coupon["coupon_is_expired"] or (coupon["coupon_end_date"] and coupon["coupon_end_date"] < today):
+        raise CouponError("This coupon has expired.")
+    if coupon["coupon_start_date"] and coupon["coupon_start_date"] > today:
+        raise CouponError("This coupon is not active yet.")
+    if coupon["coupon_discount"] is None:
+        raise CouponError("Invalid coupon code.", status=404)
+    return coupon
+
+
+def forget_coupon(code):
+    """
+    Drop the cached lookup for `code` once the current transaction commits.
+    """
+    if code:
+        transaction.on_commit(lambda: catalog_cache.delete(_cache_key(code)))
@@ -0,0 +1,139 @@
+from decimal import Decimal
+
+from django.db import connection
+
+from HCProduct.models import Category, Product, productDetails
+
+# One pass over the filtered products joined to their details. GROUPING SETS
+# produces every facet (plus the overall total) from the same scan, and
+# GROUPING() tells the result rows apart.
+FACETS_SQL = """
+WITH base AS (
+    SELECT p.id, p.product_price, c.id AS category_id, c.category_name, c.slug
+    FROM {product} p
+    LEFT JOIN {category} c ON c.id = p.product_category_id
+    WHERE p.id IN ({filtered_ids})
+),
+bounds AS (
+    SELECT MIN(product_price) AS lo, MAX(product_price) AS hi FROM base
+),
+facet_rows AS (
+    SELECT
+        b.id,
+        b.category_id,
+        b.category_name,
+        b.slug,
+        LOWER(d.product_meatcut) AS meatcut,
+        d.product_origin AS origin,
+        d.product_processing AS processing,
+        CASE
+            WHEN b.product_price IS NULL THEN NULL
+            WHEN bounds.hi = bounds.lo THEN 1
+            ELSE LEAST(width_bucket(b.product_price, bounds.lo, bounds.hi, %s), %s)
+        END AS bucket
+    FROM base b
+    CROSS JOIN bounds
+    LEFT JOIN {details} d ON d.product_id = b.id
+)
+SELECT
+    GROUPING(category_id, category_name, slug) AS g_category,
+    GROUPING(meatcut) AS g_meatcut,
+    GROUPING(origin) AS g_origin,
+    GROUPING(processing) AS g_processing,
+    GROUPING(bucket) AS g_bucket,
+    category_id,
+    category_name,
+    slug,
+    meatcut,
+    origin,
+    processing,
+    bucket,
+    COUNT(DISTINCT id) AS product_count,
+    (SELECT lo FROM bounds) AS price_lo,
+    (SELECT hi FROM bounds) AS price_hi
+FROM facet_rows
+GROUP BY GROUPING SETS (
+    (category_id, category_name, slug),
+    (meatcut),
+    (origin),
+    (processing),
+    (bucket),
+    ()
+)
+"""
+
+
+def _bucket_range(lo, hi, bucket, buckets):
+    if lo is None or hi is None or lo == hi:
+        return lo, hi
+    width = (hi - lo) / buckets
+    cent = Decimal("0.01")
+    return (lo + width * (bucket - 1)).quantize(cent), (lo + width * bucket).quantize(cent)
+
+
+def product_facets(products, buckets):
+    """
+    Count the products in a filtered Product queryset per category, meat cut,
+    origin and processing, plus a price histogram with `buckets` equal-width bins.
+    """
+    filtered_sql, filtered_params = products.order_by().values("id").query.sql_with_params()
+    sql = FACETS_SQL.format(
+        product=connection.ops.quote_name(Product._meta.db_table),
+        category=connection.ops.quote_name(Category._meta.db_table),
+        details=connection.ops.quote_name(productDetails._meta.db_table),
+        filtered_ids=filtered_sql,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*filtered_params, buckets, buckets])
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    facets = {
+        "total": 0,
+        "categories": [],
+        "meat_cuts": [],
+        "origins": [],
+        "processing": [],
+        "price_histogram": [],
+    }
+    bucket_counts = {}
+    price_lo = price_hi = None
+    for row in rows:
+        count = row["product_count"]
+        if row["g_category"] == 0:
+            if row["category_id"] is not None:
+                facets["categories"].append(
+                    {
+                        "id": row["category_id"],
+                        "category_name": row["category_name"],
+                        "slug": row["slug"],
+                        "count": count,
+                    }
+                )
+        elif row["g_meatcut"] == 0:
+            if row["meatcut"]:
+                facets["meat_cuts"].append({"value": row["meatcut"], "count": count})
+        elif row["g_origin"] == 0:
+            if row["origin"]:
+                facets["origins"].append({"value": row["origin"], "count": count})
+        elif row["g_processing"] == 0:
+            if row["processing"]:
+                facets["processing"].append({"value": row["processing"], "count": count})
+        elif row["g_bucket"] == 0:
+            if row["bucket"] is not None:
+                bucket_counts[row["bucket"]] = count
+        else:
+            facets["total"] = count
+            price_lo, price_hi = row["price_lo"], row["price_hi"]
+
+    if price_lo is not None:
+        # Emit empty bins too so the histogram always spans the price range
+        for bucket in range(1, (1 if price_lo == price_hi else buckets) + 1):
+            low, high = _bucket_range(price_lo, price_hi, bucket, buckets)
+            facets["price_histogram"].append(
+                {"bucket": bucket, "min_price": low, "max_price": high, "count": bucket_counts.get(bucket, 0)}
+            )
+
+    for key in ("categories", "meat_cuts", "origins", "processing"):
+        facets[key].sort(key=lambda facet: -facet["count"])
+    return facets
@@ -0,0 +1,141 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from HCProduct.utils.catalog_cache import catalog_cache, LocalLRUCache
+
+# Per-worker map of (image name, epoch) -> URL in front of the shared Redis copy
+local_image_urls = LocalLRUCache(maxsize=4096)
+
+
+def _is_signed(storage=default_storage):
+    """
+    Whether the storage hands out expiring URLs (S3 presigned or CloudFront signed).
+    """
+    if not getattr(storage, "querystring_auth", False):
+        return False
+    return not getattr(storage, "custom_domain", None) or bool(getattr(storage, "cloudfront_signer", None))
+
+
+def _signed_window(storage=default_storage):
+    return max(1, int(getattr(storage, "querystring_expire", 3600)) // 2)
+
+
+def image_url_epoch():
+    """
+    Current URL generation. Always 0 for unsigned URLs; for signed URLs it moves
+    every half expiry, so a URL handed out in an epoch stays valid well past it.
+    """
+    if not _is_signed():
+        return 0
+    return int(time.time()) // _signed_window()
+
+
+def _redis_key(name, epoch):
+    return f"image_url:{epoch}:{hashlib.md5(name.encode('utf-8')).hexdigest()}"
+
+
+def _image_name(image):
+    # Accepts a FieldFile or a stored name
+    name = getattr(image, "name", image)
+    return str(name) if name else None
+
+
+def resolve_image_urls(images):
+    """
+    Resolve storage names (or FieldFiles) to URLs, computing each one once per
+    epoch across all workers. Returns {name: url}.
+    """
+    names = {name for name in map(_image_name, images) if name}
+    if not names:
+        return {}
+    epoch = image_url_epoch()
+    urls = {}
+    missing = []
+    for name in names:
+        if "://" in name:
+            # Already a URL (legacy rows stored one)
+            urls[name] = name
+            continue
+        url = local_image_urls.get((name, epoch))
+        if url is None:
+            missing.append(name)
+        else:
+            urls[name] = url
+
+    if missing:
+        keys = {_redis_key(name, epoch): name for name in missing}
+        cached = catalog_cache.get_many(list(keys))
+        fresh = {}
+        for key, name in keys.items():
+            url = cached.get(key)
+            if url is None:
+                url = default_storage.url(name)
+                fresh[key] = url
+            urls[name] = url
+            local_image_urls.set((name, epoch), url)
+        if fresh:
+            timeout = _signed_window() if epoch else settings.IMAGE_URL_CACHE_TIMEOUT
+            catalog_cache.set_many(fresh, timeout=timeout)
+    return urls
+
+
+def resolve_image_url(image):
+    name = _image_name(image)
+    if not name:
+        return None
+    return resolve_image_urls([name])[name]
+
+
+def forget_image_url(image):
+    """
+    Drop the cached URL of an image that was replaced or deleted. Other workers
+    may keep their in-process copy, which is harmless: names are never reused.
+    """
+    name = _image_name(image)
+    if not name:
+        return
+    epoch = image_url_epoch()
+    local_image_urls.delete((name, epoch))
+    catalog_cache.delete(_redis_key(name, epoch))
+
+
+def _rendition_names(renditions):
+    return [name for widths in (renditions or {}).values() for name in widths.values()]
+
+
+def image_variants(renditions, urls):
+    """
+    Turn a stored {format: {width: name}} rendition map into its payload form:
+    {format: {"srcset": "url 200w, url 400w", "sources": [{"width", "url"}]}}.
+    """
+    variants = {}
+    for image_format, widths in (renditions or {}).items():
+        sources = sorted(
+            ({"width": int(width), "url": urls.get(name)} for width, name in widths.items()),
+            key=lambda source: source["width"],
+        )
+        variants[image_format] = {
+            "srcset": ", ".join(f"{source['url']} {source['width']}w" for source in sources),
+            "sources": sources,
+        }
+    return variants
+
+
+def resolve_document_images(documents, field="product_image"):
+    """
+    Replace the stored image name (and rendition names under `<field>_variants`)
+    in each rendered document with URLs, in place.
+    """
+    variants_field = f"{field}_variants"
+    names = []
+    for document in documents:
+        names.append(document.get(field))
+        names.extend(_rendition_names(document.get(variants_field)))
+    urls = resolve_image_urls(names)
+    for document in documents:
+        document[field] = urls.get(document.get(field))
+        document[variants_field] = image_variants(document.get(variants_field), urls)
+    return documents
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from HCProduct.models import Coupon, ProductSnapshot
+from HCProduct.utils.coupons import forget_coupon
+from HCProduct.utils.snapshots import refresh_stale_snapshots
+
+
+def expire_coupons(today=None):
+    """
+    Flag every coupon past its end date as expired with a single UPDATE.
+    Returns the number of coupons flipped.
+    """
+    today = today or timezone.localdate()
+    expired = Coupon.objects.filter(coupon_is_expired=False, coupon_end_date__lt=today)
+    with transaction.atomic():
+        # .update() skips the signals that drop cached coupon lookups
+        for code in expired.exclude(coupon_code__isnull=True).values_list("coupon_code", flat=True):
+            forget_coupon(code)
+        return expired.update(coupon_is_expired=True, updated_at=timezone.now())
+
+
+def upcoming_boundaries(now, window):
+    """
+    Distinct discount start/end moments in `(now, now + window]`, in order:
+    when the catalog next needs re-rendering. Snapshots already hold the
+    earliest one per product as `valid_until`.
+    """
+    return list(
+        ProductSnapshot.objects.filter(valid_until__gt=now, valid_until__lte=now + window)
+        .order_by("valid_until")
+        .values_list("valid_until", flat=True)
+        .distinct()
+    )
+
+
+def sweep(now=None, window=timedelta(minutes=5)):
+    """
+    One sweeper pass: expire coupons and re-render every snapshot whose
+    discount window opened or closed, which bumps the catalog version once.
+    Returns a summary including the boundaries due within `window`.
+    """
+    now = now or timezone.now()
+    coupons = expire_coupons(timezone.localdate(now))
+    with transaction.atomic():
+        snapshots = refresh_stale_snapshots()
+    return {
+        "coupons_expired": coupons,
+        "snapshots_refreshed": snapshots,
+        "boundaries": upcoming_boundaries(now, window),
+    }
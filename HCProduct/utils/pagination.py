@@ -0,0 +1,87 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _encode_value(value):
+    # Full precision on purpose: DjangoJSONEncoder truncates microseconds,
+    # which would make keyset comparisons skip or repeat rows
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(values, ordering):
+    """
+    Encode the ordering values of the last row on a page into an opaque cursor.
+    The ordering is embedded so a cursor cannot be replayed under another sort.
+    """
+    raw = json.dumps({"o": list(ordering), "v": list(values)}, default=_encode_value, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _ordering_field(queryset, name):
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    if name == "pk":
+        return queryset.model._meta.pk
+    return queryset.model._meta.get_field(name)
+
+
+def decode_cursor(cursor, ordering, queryset):
+    """
+    Decode a cursor produced by `encode_cursor` for rows of `queryset` (which
+    must carry any annotations the ordering uses). Each value is converted by
+    the field it is compared with. Returns None if the cursor is malformed,
+    does not match the given ordering or holds a value of the wrong type.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+    if not isinstance(payload, dict) or payload.get("o") != list(ordering):
+        return None
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(ordering):
+        return None
+    converted = []
+    for field, value in zip(ordering, values):
+        if value is None or isinstance(value, (list, dict, bool)):
+            return None
+        try:
+            converted.append(_ordering_field(queryset, field.lstrip("-")).to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            return None
+    return converted
+
+
+def cursor_values(obj, ordering):
+    """
+    Read the ordering fields of `obj`, e.g. ("-created_at", "-id") -> [created_at, id].
+    """
+    return [getattr(obj, field.lstrip("-")) for field in ordering]
+
+
+def keyset_filter(ordering, values):
+    """
+    Build the filter selecting rows strictly after `values` in `ordering`.
+
+    For ("-created_at", "-id") this is:
+        created_at < c OR (created_at = c AND id < i)
+    """
+    condition = Q()
+    equal_so_far = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal_so_far & Q(**{f"{name}__{lookup}": value})
+        equal_so_far &= Q(**{name: value})
+    return condition
@@ -0,0 +1,107 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from HCProduct.models import ProductDiscount
+
+# Largest value a DecimalField(max_digits=10, decimal_places=2) can hold; used to
+# sort unpriced products after every priced one
+MAX_PRICE = Decimal("99999999.99")
+
+
+def active_discounts(product_ref, at=None):
+    """
+    Discounts active at `at` (default now) for the product referenced by
+    `product_ref`, best first. Open-ended windows count as active.
+    """
+    at = at or timezone.now()
+    return (
+        ProductDiscount.objects.filter(product=OuterRef(product_ref), discount_percentage__isnull=False)
+        .filter(Q(discount_start_date__isnull=True) | Q(discount_start_date__lte=at))
+        .filter(Q(discount_end_date__isnull=True) | Q(discount_end_date__gte=at))
+        .order_by("-discount_percentage", "-id")
+    )
+
+
+def _discounted(price_field, percentage):
+    return Round(
+        ExpressionWrapper(
+            F(price_field) * (Value(Decimal("100")) - Coalesce(percentage, Value(Decimal("0")))) / Value(Decimal("100")),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        precision=2,
+    )
+
+
+def with_effective_price(products, at=None):
+    """
+    Annotate a Product queryset with its best active discount and resulting price:
+    `active_discount_id`, `active_discount_percentage`, `active_discount_end_date`
+    and `effective_price` (equal to `product_price` when nothing is active).
+    """
+    discounts = active_discounts("pk", at)
+    return products.annotate(
+        active_discount_id=Subquery(discounts.values("id")[:1]),
+        active_discount_percentage=Subquery(discounts.values("discount_percentage")[:1]),
+        active_discount_end_date=Subquery(discounts.values("discount_end_date")[:1]),
+    ).annotate(effective_price=_discounted("product_price", F("active_discount_percentage")))
+
+
+def with_variant_effective_price(variants, at=None):
+    """
+    Annotate a ProductVariant queryset with the parent product's active discount
+    applied to the variant price.
+    """
+    discounts = active_discounts("product_id", at)
+    return variants.annotate(
+        active_discount_percentage=Subquery(discounts.values("discount_percentage")[:1]),
+    ).annotate(effective_price=_discounted("product_variant_price", F("active_discount_percentage")))
+
+
+def with_price_rank(products, descending=False):
+    """
+    Annotate `price_rank`, a non-null sort key over `effective_price` that keeps
+    unpriced products last in both directions (keyset cursors cannot page over NULLs).
+    """
+    missing = Value(Decimal("-1") if descending else MAX_PRICE)
+    return products.annotate(
+        price_rank=Coalesce(F("effective_price"), missing, output_field=DecimalField(max_digits=10, decimal_places=2))
+    )
+
+
+def apply_discount(price, percentage):
+    """
+    Python twin of the SQL effective price: same formula, and HALF_UP matches
+    Postgres ROUND() on numerics.
+    """
+    if price is None:
+        return None
+    discounted = price * (Decimal("100") - (percentage or Decimal("0"))) / Decimal("100")
+    return discounted.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def active_discount_map(product_ids, at=None):
+    """
+    {product_id: best active ProductDiscount values} in one query, for bulk
+    readers where per-row subqueries would dominate.
+    """
+    at = at or timezone.now()
+    discounts = (
+        ProductDiscount.objects.filter(product_id__in=product_ids, discount_percentage__isnull=False)
+        .filter(Q(discount_start_date__isnull=True) | Q(discount_start_date__lte=at))
+        .filter(Q(discount_end_date__isnull=True) | Q(discount_end_date__gte=at))
+        .order_by("product_id", "-discount_percentage", "-id")
+        .distinct("product_id")
+        .values(
+            "id",
+            "product_id",
+            "discount_code",
+            "discount_percentage",
+            "discount_start_date",
+            "discount_end_date",
+            "discount_type",
+        )
+    )
+    return {discount["product_id"]: discount for discount in discounts}
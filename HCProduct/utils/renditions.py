@@ -0,0 +1,140 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from HCProduct.utils.catalog_cache import bump_catalog_version
+from HCProduct.utils.category_cache import invalidate_category_cache
+from HCProduct.utils.snapshots import rebuild_snapshots
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_PREFIX = "renditions"
+
+# Output formats in order of preference for <picture> sources. JPEG is the
+# universal fallback; AVIF only when this Pillow build can encode it.
+RENDITION_FORMATS = {
+    "avif": {"format": "AVIF", "options": {"quality": 55}},
+    "webp": {"format": "WEBP", "options": {"quality": 80, "method": 4}},
+    "jpeg": {"format": "JPEG", "options": {"quality": 82, "optimize": True, "progressive": True}},
+}
+
+# Image field and renditions field per model
+RENDITION_FIELDS = {
+    "Product": ("product_image", "product_image_renditions"),
+    "Category": ("category_image", "category_image_renditions"),
+}
+
+# Threads start lazily on the first submit
+_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_RENDITION_WORKERS, thread_name_prefix="image-renditions")
+
+
+def available_formats():
+    Image.init()
+    return [name for name, spec in RENDITION_FORMATS.items() if spec["format"] in Image.SAVE]
+
+
+def rendition_name(image_name, width, extension):
+    """
+    Deterministic storage key for one rendition, e.g.
+    products/7/abc_steak.png -> renditions/products/7/abc_steak/400w.webp
+    """
+    stem, _ = posixpath.splitext(image_name)
+    return f"{RENDITIONS_PREFIX}/{stem}/{width}w.{extension}"
+
+
+def _encode(image, spec):
+    buffer = BytesIO()
+    if spec["format"] == "JPEG" and image.mode != "RGB":
+        # JPEG has no alpha channel: flatten onto white
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+        image = background
+    image.save(buffer, spec["format"], **spec["options"])
+    return ContentFile(buffer.getvalue())
+
+
+def _save(name, content):
+    # Keys are deterministic, so replace instead of letting storage rename
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, content)
+
+
+def render_image(image_name, widths=None):
+    """
+    Create the renditions of a stored image and return the map
+    {format: {width: storage name}}. Widths above the original are skipped
+    (the original width is used once instead) so images are never upscaled.
+    """
+    widths = sorted(set(widths or settings.IMAGE_RENDITION_WIDTHS))
+    with default_storage.open(image_name, "rb") as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if original.has_transparency_data else "RGB")
+
+    targets = [width for width in widths if width < original.width] or [original.width]
+    if original.width not in targets and original.width < widths[-1]:
+        targets.append(original.width)
+
+    renditions = {extension: {} for extension in available_formats()}
+    for width in targets:
+        height = max(1, round(original.height * width / original.width))
+        resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+        for extension in renditions:
+            name = _save(rendition_name(image_name, width, extension), _encode(resized, RENDITION_FORMATS[extension]))
+            renditions[extension][str(width)] = name
+    return renditions
+
+
+def generate_renditions(instance):
+    """
+    Render and attach renditions for a Product or Category image. Skips the
+    write if the image was replaced meanwhile (the newer upload queues its own).
+    """
+    image_field, renditions_field = RENDITION_FIELDS[type(instance).__name__]
+    image_name = getattr(instance, image_field).name
+    if not image_name:
+        return None
+    renditions = render_image(image_name)
+    model = type(instance)
+    # .update() skips model signals: refresh the read model explicitly
+    updated = model.objects.filter(pk=instance.pk, **{image_field: image_name}).update(
+        **{renditions_field: renditions}
+    )
+    if updated:
+        if model.__name__ == "Product":
+            rebuild_snapshots([instance.pk])
+        else:
+            bump_catalog_version()
+            invalidate_category_cache()
+    return renditions
+
+
+def _run(model, pk):
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is not None:
+            generate_renditions(instance)
+    except Exception:
+        logger.exception("Failed to generate image renditions for %s %s", model.__name__, pk)
+    finally:
+        # Each worker thread opens its own DB connection; don't leak it
+        connection.close()
+
+
+def queue_renditions(instance):
+    """
+    Generate renditions in a background thread once the current transaction
+    commits. Anything lost on a worker restart is picked up by the
+    `generate_image_renditions` command.
+    """
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: _executor.submit(_run, model, pk))
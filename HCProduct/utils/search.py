@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import F, OuterRef, Subquery
+
+from HCProduct.models import Category, Product, productDetails
+
+# Product fields that feed the search vector; saves touching none of them skip the refresh
+PRODUCT_SEARCH_FIELDS = {"product_name", "product_description", "product_category"}
+
+
+def _category_name():
+    return Subquery(Category.objects.filter(pk=OuterRef("product_category_id")).values("category_name")[:1])
+
+
+def _details_text(field):
+    return Subquery(
+        productDetails.objects.filter(product=OuterRef("pk"))
+        .values("product")
+        .annotate(text=StringAgg(field, delimiter=" "))
+        .values("text")
+    )
+
+
+def search_vector_expression():
+    """
+    Weighted vector: name (A), category and details (B), description (C).
+    """
+    config = settings.PRODUCT_SEARCH_CONFIG
+    return (
+        SearchVector("product_name", weight="A", config=config)
+        + SearchVector(_category_name(), weight="B", config=config)
+        + SearchVector(_details_text("product_meatcut"), weight="B", config=config)
+        + SearchVector(_details_text("product_origin"), weight="B", config=config)
+        + SearchVector(_details_text("product_processing"), weight="B", config=config)
+        + SearchVector("product_description", weight="C", config=config)
+    )
+
+
+def refresh_search_vectors(products):
+    """
+    Recompute `search_vector` for a Product queryset in a single UPDATE.
+    """
+    return products.update(search_vector=search_vector_expression())
+
+
+def search_products(products, text):
+    """
+    Filter a Product queryset by a web-style search query and order it by rank.
+    """
+    query = SearchQuery(text, search_type="websearch", config=settings.PRODUCT_SEARCH_CONFIG)
+    return (
+        products.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "-id")
+    )
+
+
+def _suggest(qs, field, text, limit):
+    if len(text) < 3:
+        # Too short to form a trigram; a plain prefix match is cheap enough here
+        # because these results live in the per-worker prefix cache
+        return qs.filter(**{f"{field}__istartswith": text}).order_by(field)[:limit]
+    # `%>` (word similarity) tolerates typos and is served by the gin_trgm_ops index
+    return (
+        qs.filter(**{f"{field}__trigram_word_similar": text})
+        .annotate(similarity=TrigramWordSimilarity(text, field))
+        .order_by("-similarity", field)[:limit]
+    )
+
+
+def suggest_products(text, limit):
+    """
+    Autocomplete suggestions for the search box: closest product and category names.
+    """
+    products = _suggest(
+        Product.objects.select_related("product_category").only(
+            "id", "product_name", "product_category__category_name"
+        ),
+        "product_name",
+        text,
+        limit,
+    )
+    categories = _suggest(Category.objects.only("id", "category_name", "slug"), "category_name", text, limit)
+    return {
+        "products": [
+            {
+                "id": product.id,
+                "product_name": product.product_name,
+                "product_category": product.product_category.category_name if product.product_category else None,
+            }
+            for product in products
+        ],
+        "categories": [
+            {"id": category.id, "category_name": category.category_name, "slug": category.slug}
+            for category in categories
+        ],
+    }
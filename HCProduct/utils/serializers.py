@@ -0,0 +1,56 @@
+def serialize_detail(detail):
+    return {
+        "id": detail.id,
+        "product_meatcut": detail.product_meatcut,
+        "product_weight": detail.product_weight,
+        "product_packaging": detail.product_packaging,
+        "product_origin": detail.product_origin,
+        "product_processing": detail.product_processing,
+    }
+
+
+def serialize_discount(discount):
+    return {
+        "id": discount.id,
+        "discount_percentage": discount.discount_percentage,
+        "discount_start_date": discount.discount_start_date,
+        "discount_end_date": discount.discount_end_date,
+        "discount_code": discount.discount_code,
+        "discount_type": discount.discount_type,
+    }
+
+
+def serialize_active_discount(product):
+    if getattr(product, "active_discount_id", None) is None:
+        return None
+    return {
+        "id": product.active_discount_id,
+        "discount_percentage": product.active_discount_percentage,
+        "discount_end_date": product.active_discount_end_date,
+    }
+
+
+def serialize_product(product):
+    """
+    Product card as returned by the catalog listings. Expects `product_category`
+    selected, `details` prefetched and the `with_effective_price` annotations.
+
+    `product_image` and `product_image_variants` hold storage names so cached
+    cards never carry expiring URLs; responses resolve them with
+    `resolve_document_images`.
+    """
+    return {
+        "id": product.id,
+        "product_name": product.product_name,
+        "product_category": product.product_category.category_name if product.product_category else None,
+        "product_image": product.product_image.name or None,
+        "product_image_variants": product.product_image_renditions,
+        "product_description": product.product_description,
+        "product_price": product.product_price,
+        "product_upcoming": product.product_upcoming,
+        "product_rating": product.product_rating,
+        "effective_price": product.effective_price,
+        "active_discount": serialize_active_discount(product),
+        "created_at": product.created_at,
+        "details": [serialize_detail(detail) for detail in product.details.all()],
+    }
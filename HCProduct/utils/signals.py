@@ -0,0 +1,22 @@
+import threading
+from contextlib import contextmanager
+
+_state = threading.local()
+
+
+@contextmanager
+def mute_catalog_signals():
+    """
+    Within the block, the model signals that refresh derived catalog data
+    (cache version, search vectors, snapshots) do nothing. For bulk writes
+    whose caller refreshes that data once for all affected products.
+    """
+    _state.depth = getattr(_state, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _state.depth -= 1
+
+
+def catalog_signals_muted():
+    return getattr(_state, "depth", 0) > 0
@@ -0,0 +1,117 @@
+from django.db import transaction
+from django.utils import timezone
+
+from HCProduct.models import Product, ProductSnapshot
+from HCProduct.utils.catalog_cache import bump_catalog_version
+from HCProduct.utils.pricing import with_effective_price
+from HCProduct.utils.serializers import serialize_product
+
+# Columns refreshed when an existing snapshot is re-rendered
+SNAPSHOT_UPDATE_FIELDS = [
+    "category",
+    "category_name",
+    "meatcuts",
+    "effective_price",
+    "rating",
+    "document",
+    "valid_until",
+    "created_at",
+    "updated_at",
+]
+
+
+def _valid_until(product, now):
+    """
+    Earliest future discount start or end: the price in the document changes then.
+    """
+    boundaries = [
+        moment
+        for discount in product.discounts.all()
+        if discount.discount_percentage is not None
+        for moment in (discount.discount_start_date, discount.discount_end_date)
+        if moment is not None and moment > now
+    ]
+    return min(boundaries, default=None)
+
+
+def render_snapshot(product, now):
+    """
+    Build the snapshot row for a product loaded by `rebuild_snapshots`.
+    """
+    return ProductSnapshot(
+        product=product,
+        category_id=product.product_category_id,
+        category_name=product.product_category.category_name if product.product_category else None,
+        meatcuts=sorted({detail.product_meatcut.lower() for detail in product.details.all() if detail.product_meatcut}),
+        effective_price=product.effective_price,
+        rating=product.product_rating or 0,
+        document=serialize_product(product),
+        valid_until=_valid_until(product, now),
+        created_at=product.created_at,
+    )
+
+
+def _render_snapshots(product_ids, now):
+    products = with_effective_price(
+        Product.objects.filter(pk__in=product_ids)
+        .select_related("product_category")
+        .prefetch_related("details", "discounts"),
+        at=now,
+    )
+    return [render_snapshot(product, now) for product in products]
+
+
+def rebuild_snapshots(product_ids):
+    """
+    Re-render the snapshots of the given products with one upsert.
+    Ids of products that no longer exist are ignored (their rows cascade away).
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    snapshots = _render_snapshots(product_ids, timezone.now())
+    ProductSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=SNAPSHOT_UPDATE_FIELDS,
+    )
+    # Cached pages may have been built from the previous documents
+    bump_catalog_version()
+    return len(snapshots)
+
+
+def schedule_snapshot_rebuild(product_ids):
+    """
+    Rebuild after the surrounding transaction commits, so the render sees the
+    final state of every related row (and nothing from a rolled-back write).
+    """
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: rebuild_snapshots(product_ids))
+
+
+def current_documents(snapshots):
+    """
+    Documents of `snapshots` (loaded with `document` and `valid_until`), in
+    order. Those whose discount window opened or closed since they were built
+    are rendered again as of now, in memory only: reads never write, and the
+    sweeper (sweep_catalog_lifecycle) saves the rebuilt rows.
+    """
+    now = timezone.now()
+    stale = [
+        snapshot.product_id
+        for snapshot in snapshots
+        if snapshot.valid_until is not None and snapshot.valid_until <= now
+    ]
+    rendered = {snapshot.product_id: snapshot.document for snapshot in _render_snapshots(stale, now)} if stale else {}
+    return [rendered.get(snapshot.product_id, snapshot.document) for snapshot in snapshots]
+
+
+def refresh_stale_snapshots():
+    """
+    Re-render snapshots whose discount window opened or closed since they were built.
+    """
+    now = timezone.now()
+    stale = ProductSnapshot.objects.filter(valid_until__lte=now).values_list("product_id", flat=True)
+    return rebuild_snapshots(stale)
@@ -0,0 +1,105 @@
+import posixpath
+import uuid
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.storage import storages
+from django.utils.text import get_valid_filename
+
+from HCProduct.utils.catalog_cache import catalog_cache
+
+# Key prefixes clients may upload under, matching the multipart endpoints
+UPLOAD_TARGETS = {"products", "categories"}
+UPLOAD_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/avif", "image/gif"}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _storage():
+    return storages["default"]
+
+
+def supports_direct_upload():
+    storage = _storage()
+    return hasattr(storage, "bucket_name") and hasattr(storage, "connection")
+
+
+def _pending_key(key):
+    return f"image_upload:{key}"
+
+
+def _s3_key(storage, key):
+    # Storage names are relative to AWS_LOCATION; S3 needs the full object key
+    return storage._normalize_name(key)
+
+
+def issue_upload(target, filename, content_type, user_id=None):
+    """
+    Reserve a storage key under `target` and return a presigned POST for it:
+    {"key", "url", "fields", "expires_in", "max_bytes"}. The browser posts the
+    file straight to S3; the app only ever sees the key.
+    """
+    if target not in UPLOAD_TARGETS:
+        raise UploadError(f"target must be one of: {', '.join(sorted(UPLOAD_TARGETS))}.")
+    if content_type not in UPLOAD_CONTENT_TYPES:
+        raise UploadError(f"Unsupported content type. Use one of: {', '.join(sorted(UPLOAD_CONTENT_TYPES))}.")
+    if not supports_direct_upload():
+        raise UploadError("Direct uploads require S3 storage.", status=501)
+
+    storage = _storage()
+    safe_name = get_valid_filename(posixpath.basename(filename or "")) or "image"
+    owner = f"{user_id}/" if target == "products" else ""
+    key = f"{target}/{owner}{uuid.uuid4()}_{safe_name}"
+    expires_in = settings.IMAGE_UPLOAD_URL_EXPIRE
+
+    fields = {"Content-Type": content_type}
+    conditions = [{"Content-Type": content_type}, ["content-length-range", 1, settings.IMAGE_UPLOAD_MAX_BYTES]]
+    if getattr(storage, "default_acl", None):
+        fields["acl"] = storage.default_acl
+        conditions.append({"acl": storage.default_acl})
+
+    presigned = storage.connection.meta.client.generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=_s3_key(storage, key),
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=expires_in,
+    )
+    # Only keys issued here can be confirmed, and only for their target
+    catalog_cache.set(_pending_key(key), target, timeout=expires_in + 5 * 60)
+    return {
+        "key": key,
+        "url": presigned["url"],
+        "fields": presigned["fields"],
+        "expires_in": expires_in,
+        "max_bytes": settings.IMAGE_UPLOAD_MAX_BYTES,
+    }
+
+
+def claim_upload(key, target):
+    """
+    Check that `key` was issued for `target` and the object really landed in
+    the bucket as an acceptable image, then consume the reservation.
+    """
+    if catalog_cache.get(_pending_key(key)) != target:
+        raise UploadError("Unknown or expired upload key.")
+
+    storage = _storage()
+    client = storage.connection.meta.client
+    try:
+        head = client.head_object(Bucket=storage.bucket_name, Key=_s3_key(storage, key))
+    except ClientError:
+        raise UploadError("The file has not been uploaded yet.", status=409)
+    if head.get("ContentType") not in UPLOAD_CONTENT_TYPES:
+        raise UploadError("Uploaded object is not a supported image.")
+    if head.get("ContentLength", 0) > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise UploadError("Uploaded file is too large.")
+
+    # Deleting is the claim: a concurrent confirm of the same key loses here
+    if not catalog_cache.delete(_pending_key(key)):
+        raise UploadError("Unknown or expired upload key.")
+    return key
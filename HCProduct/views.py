@@ -3,24 +3,55 @@ from django.shortcuts import render
 from ninja_extra import NinjaExtraAPI, api_controller, http_get
 from ninja_extra.permissions import IsAuthenticated
 from .schemas import ProductSchema, ProductCreateSchema, ProductVariantSchema, CategorySchema,ProductDetailsSchema, ProductDiscountSchema, CouponSchema
+from .schemas import ImageUploadRequestSchema, ImageUploadConfirmSchema, BatchOperationsSchema, CouponValidateSchema
 from HCCart.schemas import CartItemSchema, CartSchema
-from HCProduct.models import Product, Category, ProductVariant, productDetails, ProductDiscount, Coupon
-from HCCart.models import Cart, CartItem
+from HCProduct.models import Product, Category, ProductVariant, productDetails, ProductDiscount, Coupon, ProductSnapshot
+from HCCart.utils import guest as guest_cart
+from HCCart.utils import store as cart_store
 from django.contrib.auth import authenticate, logout, login
 from ninja_jwt.controller import NinjaJWTDefaultController
 from ninja_jwt.controller import TokenObtainPairController
 from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.db import IntegrityError, transaction
 from django.contrib.auth import get_user_model
 # from django.core.cache import caches
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.csrf import ensure_csrf_cookie
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from ninja_jwt.authentication import JWTAuth
 from HCUser.utils.permission_auth_util import ClerkAuthenticationPermission
 from HCUser.utils.auth_util import clerk_authenticated
+from HCProduct.utils.catalog_cache import (
+    catalog_cache,
+    catalog_cache_key,
+    cache_catalog_payload,
+    catalog_etag,
+    catalog_response,
+    get_catalog_version,
+    not_modified_response,
+    LocalLRUCache,
+    CATALOG_CACHE_CONTROL,
+)
+from HCProduct.utils.pagination import encode_cursor, decode_cursor, cursor_values, keyset_filter
+from HCProduct.utils.counts import count_products
+from HCProduct.utils.search import search_products, suggest_products
+from HCProduct.utils.serializers import serialize_discount, serialize_product
+from HCProduct.utils.snapshots import current_documents
+from HCProduct.utils.pricing import with_effective_price, with_price_rank, with_variant_effective_price
+from HCProduct.utils.facets import product_facets
+from HCProduct.utils.image_urls import resolve_document_images, resolve_image_url
+from HCProduct.utils.renditions import queue_renditions
+from HCProduct.utils.uploads import UploadError, claim_upload, issue_upload
+from HCProduct.utils.catalog_import import CatalogImporter, detect_format, iter_rows
+from HCProduct.utils.catalog_export import export_queryset, stream_csv, stream_ndjson
+from HCProduct.utils.catalog_batch import MAX_BATCH_OPERATIONS, CatalogBatch
+from HCProduct.utils.category_cache import category_table, get_category
+from HCProduct.utils.coupons import CouponError, validate_coupon
 import uuid
 import json
+from decimal import Decimal, InvalidOperation
 from django.core.files.storage import default_storage
 from django.contrib.auth.decorators import login_required
 from typing import Any, Optional, List, Dict
@@ -36,17 +67,37 @@ api.register_controllers(NinjaJWTDefaultController)
 
 # Create your views here.
 
-"""Get All Products"""
+# Listing order shared by offset and cursor pagination. `pk` rather than `id`
+# so the same ordering applies to Product and ProductSnapshot rows.
+PRODUCT_ORDERING = ("-created_at", "-pk")
 
-@api.get("/products", tags=["products"])
-def get_all_products(request):
+# `sort` options for `/products`: (ordering, price_rank direction or None).
+# Every ordering ends on `id` so keyset cursors stay unambiguous.
+PRODUCT_SORTS = {
+    "newest": (PRODUCT_ORDERING, None),
+    "price_asc": (("price_rank", "pk"), False),
+    "price_desc": (("-price_rank", "-pk"), True),
+    "rating": (("-rating", "-pk"), None),
+}
+
+
+def _parse_price(value):
     """
-    Retrieve products with optional pagination and category filtering.
+    Parse a price filter, ignoring anything that is not a non-negative number.
+    """
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+    if not price.is_finite() or price < 0:
+        return None
+    return price
 
-    Query params:
-    - offset: int >= 0 (default 0)
-    - limit:  int in [1, 200] (default 12)
-    - category: str (case-insensitive match on category name)
+
+def _page_params(request):
+    """
+    Parse the pagination and sort params shared by the product listings.
+    Returns `(offset, limit, sort, cursor, cursor_position)`, or a 400 response.
     """
     # Parse and clamp query params safely
     try:
@@ -62,85 +113,400 @@ def get_all_products(request):
         offset = 0
         limit = 12
 
-    category_query = request.GET.get("category")
-    meatcut_query = request.GET.get("meatCut")
+    sort = request.GET.get("sort") or "newest"
+    if sort not in PRODUCT_SORTS:
+        return JsonResponse(
+            {"success": False, "message": f"Invalid sort. Use one of: {', '.join(PRODUCT_SORTS)}."},
+            status=400,
+        )
+    ordering = PRODUCT_SORTS[sort][0]
+
+    cursor = request.GET.get("cursor")
+    cursor_position = None
+    if cursor:
+        # Every sort's annotations, so each cursor value can be type-checked
+        cursor_position = decode_cursor(cursor, ordering, with_price_rank(ProductSnapshot.objects.all()))
+        if cursor_position is None:
+            return JsonResponse({"success": False, "message": "Invalid cursor."}, status=400)
+    return offset, limit, sort, cursor, cursor_position
 
-    # Base queryset with related data for efficiency
-    qs = (
-        Product.objects.prefetch_related("details", "discounts")
-        .select_related("product_category")
-        .all()
-        .order_by("-created_at", "-id")
+"""Get All Products"""
+
+@api.get("/products", tags=["products"])
+def get_all_products(request):
+    """
+    Retrieve products with optional pagination and category filtering.
+
+    Query params:
+    - offset: int >= 0 (default 0)
+    - limit:  int in [1, 200] (default 12)
+    - category: str (case-insensitive match on category name)
+    - sort: newest | price_asc | price_desc | rating (default newest; prices
+      are compared after the active discount, unrated products come last)
+    - min_price / max_price: decimal bounds on the effective price
+    - cursor: str (opaque keyset cursor; pass it empty for the first page and
+      then the returned `next_cursor`. Skips `offset` and the total count.)
+    """
+    params = _page_params(request)
+    if isinstance(params, JsonResponse):
+        return params
+    offset, limit, sort, cursor, cursor_position = params
+
+    # Normalized up front: both filters are case-insensitive, so this keeps
+    # cache keys for equivalent queries identical
+    category_query = (request.GET.get("category") or "").lower() or None
+    meatcut_query = (request.GET.get("meatCut") or "").strip().lower() or None
+    min_price = _parse_price(request.GET.get("min_price"))
+    max_price = _parse_price(request.GET.get("max_price"))
+
+    # Serve warm pages straight from Redis; the key embeds the catalog version
+    # so any catalog write makes older pages unreachable
+    cache_key = catalog_cache_key(
+        "products",
+        offset if cursor is None else None,
+        limit,
+        cursor,
+        category_query,
+        meatcut_query,
+        sort,
+        min_price,
+        max_price,
     )
+    etag = catalog_etag(cache_key)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    payload = catalog_cache.get(cache_key)
+
+    if payload is None:
+        payload = _build_products_page(
+            offset,
+            limit,
+            category_query,
+            meatcut_query,
+            cursor_position=cursor_position,
+            keyset=cursor is not None,
+            sort=sort,
+            min_price=min_price,
+            max_price=max_price,
+        )
+        cache_catalog_payload(cache_key, payload)
+
+    resolve_document_images(payload["data"])
+    return catalog_response(payload, etag)
+
 
+def _filter_products(qs, category_query, meatcut_query):
+    """
+    Apply the `/products` filters (already normalized to lower case).
+    """
     # Optional category name filter (case-insensitive contains)
     if category_query:
         qs = qs.filter(product_category__category_name__icontains=category_query)
     # Optional meat cut filter from related details
     if meatcut_query:
-        qs = qs.filter(details__product_meatcut__iexact=str(meatcut_query).strip().lower()).distinct()
+        qs = qs.filter(details__product_meatcut__iexact=meatcut_query).distinct()
+    return qs
 
-    total = qs.count()
-    items = list(qs[offset : offset + limit])
 
-    product_list = []
-    for product in items:
-        details = product.details.all()
-        details_list = [
-            {
-                "id": detail.id,
-                "product_meatcut": detail.product_meatcut,
-                "product_weight": detail.product_weight,
-                "product_packaging": detail.product_packaging,
-                "product_origin": detail.product_origin,
-                "product_processing": detail.product_processing,
-            }
-            for detail in details
-        ]
+def _filter_snapshots(qs, category_query, meatcut_query, min_price=None, max_price=None):
+    """
+    The `/products` filters against the ProductSnapshot columns.
+    """
+    if category_query:
+        qs = qs.filter(category_name__icontains=category_query)
+    if meatcut_query:
+        # Snapshot meat cuts are stored lower-cased
+        qs = qs.filter(meatcuts__contains=[meatcut_query])
+    # Price bounds apply to the discounted price customers actually pay
+    if min_price is not None:
+        qs = qs.filter(effective_price__gte=min_price)
+    if max_price is not None:
+        qs = qs.filter(effective_price__lte=max_price)
+    return qs
+
+
+def _build_products_page(
+    offset,
+    limit,
+    category_query,
+    meatcut_query,
+    cursor_position=None,
+    keyset=False,
+    sort="newest",
+    min_price=None,
+    max_price=None,
+    category_id=None,
+    cache_count=True,
+):
+    """
+    Run the catalog queries for one page of `/products` (or of one category,
+    by `category_id`) and build its payload.
 
-        discounts = product.discounts.all()
-        discounts_list = [
-            {
-                "id": discount.id,
-                "discount_percentage": discount.discount_percentage,
-                "discount_start_date": discount.discount_start_date,
-                "discount_end_date": discount.discount_end_date,
-                "discount_code": discount.discount_code,
-                "discount_type": discount.discount_type,
-            }
-            for discount in discounts
-        ]
+    Pages are read from the ProductSnapshot read model: a single query over
+    pre-rendered documents, with no joins or prefetches. Rows past a discount
+    boundary are rendered again in memory until the sweeper saves them.
 
-        product_list.append(
-            {
-                "id": product.id,
-                "product_name": product.product_name,
-                "product_category": product.product_category.category_name if product.product_category else None,
-                "product_image": (
-                    product.product_image.url
-                    if getattr(product, "product_image", None) and hasattr(product.product_image, "url")
-                    else (str(product.product_image) if product.product_image else None)
-                ),
-                "product_description": product.product_description,
-                "product_price": product.product_price,
-                "product_upcoming": product.product_upcoming,
-                "created_at": product.created_at,
-                "details": details_list,
-                "discounts": discounts_list,
-            }
+    With `keyset` the page starts after `cursor_position` (or at the top when it
+    is None) and no count query is run, so every page costs the same.
+    `cache_count=False` always runs the count instead of reading the cache.
+    """
+    ordering, price_descending = PRODUCT_SORTS[sort]
+    qs = ProductSnapshot.objects.only("created_at", "effective_price", "rating", "document", "valid_until")
+    if category_id is not None:
+        qs = qs.filter(category_id=category_id)
+    if price_descending is not None:
+        qs = with_price_rank(qs, descending=price_descending)
+    qs = _filter_snapshots(qs, category_query, meatcut_query, min_price, max_price).order_by(*ordering)
+
+    if keyset:
+        if cursor_position is not None:
+            qs = qs.filter(keyset_filter(ordering, cursor_position))
+        # Fetch one extra row to know whether another page exists
+        items = list(qs[: limit + 1])
+        next_cursor = (
+            encode_cursor(cursor_values(items[limit - 1], ordering), ordering) if len(items) > limit else None
         )
+        items = items[:limit]
+    else:
+        total, total_is_estimate = count_products(
+            qs, category_query, meatcut_query, min_price, max_price, category_id, cache=cache_count
+        )
+        items = list(qs[offset : offset + limit])
 
-    response = JsonResponse(
-        {
+    product_list = current_documents(items)
+
+    if keyset:
+        return {
             "success": True,
             "data": product_list,
+            "limit": limit,
+            "next_cursor": next_cursor,
+        }
+
+    return {
+        "success": True,
+        "data": product_list,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+    }
+
+
+"""Search Products"""
+
+@api.get("/products/search", tags=["products"])
+def search_products_view(request, q: str, offset: int = 0, limit: int = 12):
+    """
+    Full-text product search over name, description, category and details,
+    ranked by relevance. Supports web-style queries ("lamb -chops", "\"t-bone\"").
+    """
+    q = q.strip()
+    offset = max(0, offset)
+    limit = min(max(1, limit), 200)
+    if not q:
+        return JsonResponse({"success": False, "message": "Query parameter 'q' is required."}, status=400)
+
+    cache_key = catalog_cache_key("search", q.lower(), offset, limit)
+    payload = catalog_cache.get(cache_key)
+
+    if payload is None:
+        qs = search_products(
+            with_effective_price(Product.objects.prefetch_related("details").select_related("product_category")),
+            q,
+        )
+        items = list(qs[offset : offset + limit])
+        payload = {
+            "success": True,
+            "query": q,
+            "data": [serialize_product(product) for product in items],
             "offset": offset,
             "limit": limit,
-            "total": total,
+            "total": qs.count(),
         }
-    )
-    # Cache for 60s and allow shared caches to serve stale for 5 minutes while revalidating
-    response["Cache-Control"] = "public, max-age=0, s-maxage=60, stale-while-revalidate=300"
+        cache_catalog_payload(cache_key, payload)
+
+    resolve_document_images(payload["data"])
+    response = JsonResponse(payload)
+    response["Cache-Control"] = CATALOG_CACHE_CONTROL
+    return response
+
+
+"""Suggest Products (autocomplete)"""
+
+# Per-worker cache for the hottest 1-3 character prefixes, scoped by catalog version
+SUGGEST_PREFIX_MAX_LENGTH = 3
+suggest_prefix_cache = LocalLRUCache(maxsize=512)
+
+@api.get("/products/suggest", tags=["products"])
+def suggest_products_view(request, q: str, limit: int = 8):
+    """
+    Typo-tolerant autocomplete over product and category names (pg_trgm).
+    """
+    q = q.strip().lower()
+    limit = min(max(1, limit), 20)
+    if not q:
+        return JsonResponse({"success": False, "message": "Query parameter 'q' is required."}, status=400)
+
+    if len(q) <= SUGGEST_PREFIX_MAX_LENGTH:
+        # Short prefixes are few and hit on nearly every keystroke: keep them in memory
+        local_key = (get_catalog_version(), q, limit)
+        payload = suggest_prefix_cache.get(local_key)
+        if payload is None:
+            payload = {"success": True, "query": q, "data": suggest_products(q, limit)}
+            suggest_prefix_cache.set(local_key, payload)
+    else:
+        cache_key = catalog_cache_key("suggest", q, limit)
+        payload = catalog_cache.get(cache_key)
+        if payload is None:
+            payload = {"success": True, "query": q, "data": suggest_products(q, limit)}
+            cache_catalog_payload(cache_key, payload)
+
+    response = JsonResponse(payload)
+    response["Cache-Control"] = CATALOG_CACHE_CONTROL
+    return response
+
+
+"""Product Facets (filter sidebar)"""
+
+@api.get("/products/facets", tags=["products"])
+def get_product_facets(request, category: Optional[str] = None, meatCut: Optional[str] = None, buckets: int = 10):
+    """
+    Facet counts for the filter sidebar under the same filters as `/products`:
+    per category, meat cut, origin and processing, plus a price histogram.
+    All facets come from a single aggregated query.
+    """
+    category_query = (category or "").lower() or None
+    meatcut_query = (meatCut or "").strip().lower() or None
+    buckets = min(max(1, buckets), 50)
+
+    cache_key = catalog_cache_key("facets", category_query, meatcut_query, buckets)
+    payload = catalog_cache.get(cache_key)
+
+    if payload is None:
+        qs = _filter_products(Product.objects.all(), category_query, meatcut_query)
+        payload = {"success": True, "data": product_facets(qs, buckets)}
+        cache_catalog_payload(cache_key, payload)
+
+    response = JsonResponse(payload)
+    response["Cache-Control"] = CATALOG_CACHE_CONTROL
+    return response
+
+
+"""Get Products in Batch"""
+
+PRODUCT_BATCH_MAX_IDS = 200
+
+@api.get("/products/batch", tags=["products"])
+def get_products_batch(request, ids: str):
+    """
+    Retrieve several products at once, e.g. for cart and order pages.
+
+    Query params:
+    - ids: comma-separated product ids (at most 200)
+
+    `data` follows the order of `ids` (duplicates dropped). Unknown ids appear
+    as `{"id": ..., "found": false}` entries and are listed in `missing`.
+    """
+    try:
+        product_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        return JsonResponse({"success": False, "message": "ids must be comma-separated integers."}, status=400)
+    if not product_ids:
+        return JsonResponse({"success": False, "message": "Query parameter 'ids' is required."}, status=400)
+    if len(product_ids) > PRODUCT_BATCH_MAX_IDS:
+        return JsonResponse(
+            {"success": False, "message": f"At most {PRODUCT_BATCH_MAX_IDS} ids per request."}, status=400
+        )
+
+    etag = catalog_etag(catalog_cache_key("product_batch", product_ids))
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    # One indexed lookup: snapshot documents already include details and the active discount
+    snapshots = ProductSnapshot.objects.only("document", "valid_until").in_bulk(product_ids)
+    documents = dict(zip(snapshots, current_documents(list(snapshots.values()))))
+    if any(documents[pk] is not snapshot.document for pk, snapshot in snapshots.items()):
+        # Some were rendered as of now, so the tag (made for the stored documents) doesn't apply
+        etag = None
+
+    resolve_document_images(list(documents.values()))
+    data = []
+    missing = []
+    for product_id in product_ids:
+        document = documents.get(product_id)
+        if document is None:
+            missing.append(product_id)
+            data.append({"id": product_id, "found": False})
+        else:
+            data.append(document)
+    return catalog_response({"success": True, "data": data, "missing": missing}, etag)
+
+
+def _require_staff(request):
+    """
+    403 response unless the JWT-authenticated user is staff: the bulk endpoints
+    can rewrite or delete the whole catalog in one request.
+    """
+    user = request.user
+    if not (user.is_authenticated and (user.is_staff or user.is_superuser)):
+        return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
+    return None
+
+
+"""Import Products (CSV / JSONL)"""
+
+@api.post("/products/import", tags=["products"], auth=JWTAuth())
+def import_products(
+    request,
+    file: UploadedFile = File(...),
+    format: Optional[str] = Form(None),
+    chunk_size: int = Form(500),
+    dry_run: bool = Form(False),
+):
+    """
+    Bulk upsert products with their details, variants and discounts from a
+    CSV or JSONL file (one product row per line; see utils/catalog_import.py
+    for the columns). Rows match existing products by `external_id`, then by
+    name + category. Returns counts and per-row errors. Staff only.
+    """
+    forbidden = _require_staff(request)
+    if forbidden:
+        return forbidden
+    try:
+        file_format = detect_format(file.name, format)
+    except ValueError as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=400)
+
+    importer = CatalogImporter(chunk_size=min(max(1, chunk_size), 5000), dry_run=dry_run)
+    report = importer.run(iter_rows(file.file, file_format))
+    return JsonResponse({"success": report["error_count"] == 0, "data": report})
+
+
+"""Export Products (CSV / NDJSON)"""
+
+@api.get("/products/export", tags=["products"])
+def export_products(request, format: str = "csv", chunk_size: int = 2000):
+    """
+    Stream the whole catalog with details, variants and the active discount.
+    CSV uses the import columns (one row per variant); NDJSON emits one
+    document per product. Rows are read in chunks, so memory stays flat.
+    """
+    if format not in ("csv", "ndjson"):
+        return JsonResponse({"success": False, "message": "format must be 'csv' or 'ndjson'."}, status=400)
+    chunk_size = min(max(100, chunk_size), 10000)
+
+    products = export_queryset()
+    if format == "csv":
+        response = StreamingHttpResponse(stream_csv(products, chunk_size), content_type="text/csv; charset=utf-8")
+    else:
+        response = StreamingHttpResponse(stream_ndjson(products, chunk_size), content_type="application/x-ndjson")
+    filename = f"catalog-{timezone.now():%Y%m%d-%H%M%S}.{format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response["Cache-Control"] = "no-store"
     return response
 
 
@@ -151,52 +517,25 @@ def get_product(request, product_id: int):
     """
     Retrieve product details by ID.
     """
-    product = get_object_or_404(Product, id=product_id)
-    
-    # Fetch product details
-    product_details = product.details.all()
-    details_list = [
-        {
-            "id": detail.id,
-            "product_meatcut": detail.product_meatcut,
-            "product_weight": detail.product_weight,
-            "product_packaging": detail.product_packaging,
-            "product_origin": detail.product_origin,
-            "product_processing": detail.product_processing,
-        }
-        for detail in product_details
-    ]
-
-    # Fetch product discounts
-    product_discounts = product.discounts.all()
-    discounts_list = [
-        {
-            "id": discount.id,
-            "discount_percentage": discount.discount_percentage,
-            "discount_start_date": discount.discount_start_date,
-            "discount_end_date": discount.discount_end_date,
-            "discount_code": discount.discount_code,
-            "discount_type": discount.discount_type,
-        }
-        for discount in product_discounts
-    ]
+    etag = catalog_etag(catalog_cache_key("product", product_id))
+    # Checked before revalidating: once a discount starts or ends, the tag a
+    # client holds (made under the current catalog version) is stale
+    valid_until = (
+        ProductSnapshot.objects.filter(product_id=product_id).values_list("valid_until", flat=True).first()
+    )
+    if valid_until is not None and valid_until <= timezone.now():
+        # Rendered as of now below, so the tag doesn't apply to the response
+        etag = None
+    else:
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+    snapshot = get_object_or_404(ProductSnapshot.objects.only("document", "valid_until"), product_id=product_id)
+    document = current_documents([snapshot])[0]
+    resolve_document_images([document])
+    return catalog_response({"success": True, "data": document}, etag)
 
-    return JsonResponse({
-        "success": True,
-        "data": {
-            "id": product.id,
-            "product_name": product.product_name,
-            "product_category": product.product_category.category_name if product.product_category else None,
-            "product_image": (product.product_image.url if getattr(product, "product_image", None) and hasattr(product.product_image, "url") else (str(product.product_image) if product.product_image else None)),
-            "product_description": product.product_description,
-            "product_price": product.product_price,
-            "product_upcoming": product.product_upcoming,
-            "created_at": product.created_at,
-            "details": details_list,
-            "discounts": discounts_list,
-        }
-    })
-    
 """Create Product Details"""
 @api.post("/products/{product_id}/details", tags=["product_details"])
 def create_product_details(request, product_id: int, payload: ProductDetailsSchema):
@@ -273,6 +612,40 @@ def delete_product_details_by_product(request, product_id: int):
     return JsonResponse({"success": True, "message": "All product details deleted successfully"})
 
 
+def _apply_batch(model, payload):
+    """
+    Shared body of the batch endpoints (staff only): all operations apply, or
+    none do.
+    """
+    if not payload.operations:
+        return JsonResponse({"success": False, "message": "No operations given."}, status=400)
+    if len(payload.operations) > MAX_BATCH_OPERATIONS:
+        return JsonResponse(
+            {"success": False, "message": f"At most {MAX_BATCH_OPERATIONS} operations per batch."}, status=400
+        )
+    success, results = CatalogBatch(model).run(payload.operations)
+    if not success:
+        return JsonResponse(
+            {"success": False, "message": "Batch rejected; nothing was applied.", "results": results}, status=400
+        )
+    return JsonResponse({"success": True, "results": results})
+
+
+# ==========================
+# Batch Product Details
+# ==========================
+@api.post("/product/details/batch", tags=["product_details"], auth=JWTAuth())
+def batch_product_details(request, payload: BatchOperationsSchema):
+    """
+    Create, update and delete product details in one transaction.
+    `create` needs `product_id`; `update` / `delete` need the detail `id`.
+    """
+    forbidden = _require_staff(request)
+    if forbidden:
+        return forbidden
+    return _apply_batch(productDetails, payload)
+
+
 
 """Create Product Discount"""
 @api.post("/products/{product_id}/discounts", tags=["product_discounts"])
@@ -287,9 +660,34 @@ def create_product_discount(request, product_id: int, payload: ProductDiscountSc
         discount_type=payload.discount_type,
     )
     return JsonResponse({"success": True, "message": "Product discount created", "discount_id": discount.id})
+
+"""Get Product Discounts"""
+@api.get("/products/{product_id}/discounts", tags=["product_discounts"])
+def get_product_discounts(request, product_id: int):
+    """
+    Full discount history of a product, oldest first. Product payloads only
+    carry `effective_price` and `active_discount`.
+    """
+    product = get_object_or_404(Product, id=product_id)
+    discounts = [serialize_discount(discount) for discount in product.discounts.order_by("id")]
+    return JsonResponse({"success": True, "product_id": product.id, "discounts": discounts})
 from HCProduct.models import ProductDiscount
 from .schemas import ProductDiscountSchema
 
+# ==========================
+# Batch Product Discounts (declared before the {discount_id} routes)
+# ==========================
+@api.post("/product/discounts/batch", tags=["product_discounts"], auth=JWTAuth())
+def batch_product_discounts(request, payload: BatchOperationsSchema):
+    """
+    Create, update and delete product discounts in one transaction.
+    `create` needs `product_id`; `update` / `delete` need the discount `id`.
+    """
+    forbidden = _require_staff(request)
+    if forbidden:
+        return forbidden
+    return _apply_batch(ProductDiscount, payload)
+
 # ==========================
 # Get a Single Product Discount
 # ==========================
@@ -338,16 +736,45 @@ def delete_product_discount(request, discount_id: int):
 """Create a Coupon"""
 @api.post("/coupons", tags=["coupons"])
 def create_coupon(request, payload: CouponSchema):
-    coupon = Coupon.objects.create(
-        coupon_code=payload.coupon_code,
-        coupon_discount=payload.coupon_discount,
-        coupon_start_date=payload.coupon_start_date,
-        coupon_end_date=payload.coupon_end_date,
-        coupon_is_expired=payload.coupon_is_expired
-    )
+    try:
+        # Atomic so a duplicate code only rolls back this insert
+        with transaction.atomic():
+            coupon = Coupon.objects.create(
+                # Blank codes are stored as NULL, which the unique index allows more than once
+                coupon_code=payload.coupon_code or None,
+                coupon_discount=payload.coupon_discount,
+                coupon_start_date=payload.coupon_start_date,
+                coupon_end_date=payload.coupon_end_date,
+                coupon_is_expired=payload.coupon_is_expired
+            )
+    except IntegrityError:
+        return JsonResponse({"success": False, "message": "Coupon code already exists."}, status=400)
     return JsonResponse({"success": True, "message": "Coupon created", "coupon_id": coupon.id})
 
 
+"""Validate a Coupon"""
+@api.post("/coupons/validate", tags=["coupons"])
+def validate_coupon_code(request, payload: CouponValidateSchema):
+    """
+    Check one coupon code for checkout. Lookups hit a unique index and are
+    cached briefly, so clients never need the full coupon list.
+    """
+    try:
+        coupon = validate_coupon(payload.coupon_code)
+    except CouponError as e:
+        return JsonResponse({"success": False, "valid": False, "message": str(e)}, status=e.status)
+    return JsonResponse({
+        "success": True,
+        "valid": True,
+        "data": {
+            "coupon_code": coupon["coupon_code"],
+            "coupon_discount": coupon["coupon_discount"],
+            "coupon_start_date": coupon["coupon_start_date"],
+            "coupon_end_date": coupon["coupon_end_date"],
+        },
+    })
+
+
 """Get all Coupons"""
 @api.get("/coupons", tags=["coupons"])
 def get_all_coupons(request):
@@ -372,23 +799,56 @@ def get_all_coupons(request):
 @api.get("/products/category/{category_slug}", tags=["products"])
 def get_products_by_category(request, category_slug: str):
     """
-    Retrieve all products belonging to a specific category.
+    Retrieve one page of the products in a category.
+
+    Takes the same `offset` / `limit` / `cursor` / `sort` / `meatCut` /
+    `min_price` / `max_price` params as `/products`. Every sort is backed by
+    a (category, sort key) index on the snapshot table.
     """
-    category = get_object_or_404(Category, slug=category_slug)
-    products = Product.objects.filter(product_category=category)
+    params = _page_params(request)
+    if isinstance(params, JsonResponse):
+        return params
+    offset, limit, sort, cursor, cursor_position = params
+    meatcut_query = (request.GET.get("meatCut") or "").strip().lower() or None
+    min_price = _parse_price(request.GET.get("min_price"))
+    max_price = _parse_price(request.GET.get("max_price"))
+
+    category = get_category(slug=category_slug)
+    cache_key = catalog_cache_key(
+        "category_products",
+        category["id"],
+        offset if cursor is None else None,
+        limit,
+        cursor,
+        meatcut_query,
+        sort,
+        min_price,
+        max_price,
+    )
+    etag = catalog_etag(cache_key)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    payload = catalog_cache.get(cache_key)
+    if payload is None:
+        payload = _build_products_page(
+            offset,
+            limit,
+            None,
+            meatcut_query,
+            cursor_position=cursor_position,
+            keyset=cursor is not None,
+            sort=sort,
+            min_price=min_price,
+            max_price=max_price,
+            category_id=category["id"],
+        )
+        payload["category"] = category["category_name"]
+        cache_catalog_payload(cache_key, payload)
 
-    product_list = [
-        {
-            "id": product.id,
-            "product_name": product.product_name,
-            "product_image": default_storage.url(product.product_image) if product.product_image else None,
-            "product_description": product.product_description,
-            "product_price": product.product_price,
-            "product_upcoming": product.product_upcoming,
-        }
-        for product in products
-    ]
-    return JsonResponse({"success": True, "category": category.category_name, "data": product_list})
+    resolve_document_images(payload["data"])
+    return catalog_response(payload, etag)
 
 """Get Product Variants by Product"""
 
@@ -398,7 +858,7 @@ def get_product_variants(request, product_id: int):
     Retrieve all variants of a given product.
     """
     product = get_object_or_404(Product, id=product_id)
-    variants = ProductVariant.objects.filter(product=product)
+    variants = with_variant_effective_price(ProductVariant.objects.filter(product=product))
 
     variant_list = [
         {
@@ -406,6 +866,7 @@ def get_product_variants(request, product_id: int):
             "product_variant_name": variant.product_variant_name,
             "product_variant_size": variant.product_variant_size,
             "product_variant_price": variant.product_variant_price,
+            "effective_price": variant.effective_price,
             "product_variant_order": variant.product_variant_order,
             "product_variant_type": variant.product_variant_type,
         }
@@ -427,11 +888,13 @@ def get_product_by_variant(request, variant_id: int):
         "id": product.id,
         "product_name": product.product_name,
         "product_category": product.product_category.category_name if product.product_category else None,
-        "product_image": (product.product_image.url if getattr(product, "product_image", None) and hasattr(product.product_image, "url") else (str(product.product_image) if product.product_image else None)),
+        "product_image": product.product_image.name or None,
+        "product_image_variants": product.product_image_renditions,
         "product_description": product.product_description,
         "product_price": product.product_price,
         "product_upcoming": product.product_upcoming,
     }
+    resolve_document_images([product_data])
 
     return JsonResponse({"success": True, "product": product_data})
 
@@ -459,6 +922,9 @@ def create_product(request, payload: ProductCreateSchema = Form(...), file: Opti
         product_upcoming=payload.product_upcoming,
         product_image=save_path  # Stores S3 URL
     )
+    if save_path:
+        # Thumbnails and WebP/AVIF versions are rendered in the background
+        queue_renditions(product)
 
     return JsonResponse({"success": True, "message": "Product created successfully", "product_id": product.id})
 
@@ -527,12 +993,13 @@ def update_product(
     if product_upcoming is not None:
         product.product_upcoming = product_upcoming
     product.save()
+    if file:
+        queue_renditions(product)
 
     # Return updated snapshot including image URL (if set)
     image_url = None
     try:
-        if getattr(product, "product_image", None) and hasattr(product.product_image, "url"):
-            image_url = product.product_image.url
+        image_url = resolve_image_url(product.product_image)
     except Exception:
         image_url = None
 
@@ -583,10 +1050,9 @@ def update_product_image(request, product_id: int, file: Optional[UploadedFile]
         save_path = default_storage.save(file_name, file)
         product.product_image = save_path
         product.save()
+        queue_renditions(product)
 
-        image_url = None
-        if getattr(product, "product_image", None) and hasattr(product.product_image, "url"):
-            image_url = product.product_image.url
+        image_url = resolve_image_url(product.product_image)
 
         return JsonResponse({
             "success": True,
@@ -597,6 +1063,63 @@ def update_product_image(request, product_id: int, file: Optional[UploadedFile]
         return JsonResponse({"success": False, "message": f"Failed to update image: {str(e)}"}, status=500)
 
 
+"""Direct Image Uploads (presigned S3 POST)"""
+
+@api.post("/uploads/images/presign", tags=["uploads"])
+def presign_image_upload(request, payload: ImageUploadRequestSchema):
+    """
+    Step 1 of a direct upload: returns a presigned POST (`url` + form `fields`)
+    for a fresh key under `products/` or `categories/`. The client posts the
+    file to S3 itself, then calls the matching `/image/confirm` endpoint.
+    """
+    try:
+        upload = issue_upload(payload.target, payload.filename, payload.content_type, user_id=request.user.id)
+    except UploadError as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=e.status)
+    return JsonResponse({"success": True, "data": upload})
+
+
+@api.post("/products/{product_id}/image/confirm", tags=["uploads"])
+def confirm_product_image_upload(request, product_id: int, payload: ImageUploadConfirmSchema):
+    """
+    Step 2 of a direct upload: attach the uploaded key to the product and
+    queue its renditions.
+    """
+    product = get_object_or_404(Product, id=product_id)
+    try:
+        product.product_image = claim_upload(payload.key, "products")
+    except UploadError as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=e.status)
+    product.save()
+    queue_renditions(product)
+
+    return JsonResponse({
+        "success": True,
+        "message": "Product image updated successfully",
+        "data": {"product_id": product.id, "product_image": resolve_image_url(product.product_image)},
+    })
+
+
+@api.post("/categories/{category_id}/image/confirm", tags=["uploads"])
+def confirm_category_image_upload(request, category_id: int, payload: ImageUploadConfirmSchema):
+    """
+    Step 2 of a direct upload for a category image.
+    """
+    category = get_object_or_404(Category, id=category_id)
+    try:
+        category.category_image = claim_upload(payload.key, "categories")
+    except UploadError as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=e.status)
+    category.save()
+    queue_renditions(category)
+
+    return JsonResponse({
+        "success": True,
+        "message": "Category image updated successfully",
+        "data": {"category_id": category.id, "category_image": resolve_image_url(category.category_image)},
+    })
+
+
 """Create Product Variant API"""
 
 @api.post("/products/{product_id}/variant", tags=["product_variants"])
@@ -641,7 +1164,7 @@ def get_variants_by_product(request, product_id: int):
     Retrieve all variants of a given product.
     """
     product = get_object_or_404(Product, id=product_id)
-    variants = ProductVariant.objects.filter(product=product)
+    variants = with_variant_effective_price(ProductVariant.objects.filter(product=product))
 
     variant_list = [
         {
@@ -649,6 +1172,7 @@ def get_variants_by_product(request, product_id: int):
             "product_variant_name": variant.product_variant_name,
             "product_variant_size": variant.product_variant_size,
             "product_variant_price": variant.product_variant_price,
+            "effective_price": variant.effective_price,
             "product_variant_order": variant.product_variant_order,
             "product_variant_type": variant.product_variant_type,
         }
@@ -689,16 +1213,32 @@ def delete_product_variant(request, variant_id: int):
     return JsonResponse({"success": True, "message": "Product variant deleted successfully"})
 
 
+"""Batch Product Variants"""
+
+@api.post("/product/variants/batch", tags=["product_variants"], auth=JWTAuth())
+def batch_product_variants(request, payload: BatchOperationsSchema):
+    """
+    Create, update and delete product variants in one transaction, e.g. to
+    reprice a product family. `create` needs `product_id`; `update` / `delete`
+    need the variant `id`. Deleting a variant also removes it from carts.
+    """
+    forbidden = _require_staff(request)
+    if forbidden:
+        return forbidden
+    return _apply_batch(ProductVariant, payload)
+
+
 """Add Product to Cart"""
 
 @api.post("/cart/add", tags=["cart"])
-@login_required
 def add_to_cart(request, payload: CartItemSchema):
     """
-    Add a product or product variant to the cart.
+    Add a product or product variant to the cart. Anonymous sessions get a
+    guest cart (Redis only, `cart_item_id` is null) that is merged into the
+    user's cart on login.
     """
-    user = request.user  # Assuming authentication is in place
-    cart, created = Cart.objects.get_or_create(user=user)
+    if payload.quantity < 1:
+        return JsonResponse({"success": False, "message": "Quantity must be at least 1."}, status=400)
 
     product = None
     variant = None
@@ -711,19 +1251,33 @@ def add_to_cart(request, payload: CartItemSchema):
     if not product and not variant:
         return JsonResponse({"success": False, "message": "Invalid product or variant."}, status=400)
 
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart, product=product, variant=variant, defaults={"quantity": payload.quantity}
-    )
+    if not request.user.is_authenticated:
+        quantity = guest_cart.add(
+            guest_cart.guest_token(request, create=True),
+            product_id=product.id if product else None,
+            variant_id=variant.id if variant else None,
+            quantity=payload.quantity,
+        )
+        return JsonResponse({
+            "success": True,
+            "message": "Product added to cart.",
+            "cart_item_id": None,
+            "quantity": quantity
+        })
 
-    if not created:
-        cart_item.quantity += payload.quantity
-        cart_item.save()
+    # Live cart in Redis; Postgres is written behind (see HCCart/utils/store.py)
+    cart_item_id, quantity = cart_store.add(
+        request.user.id,
+        product_id=product.id if product else None,
+        variant_id=variant.id if variant else None,
+        quantity=payload.quantity,
+    )
 
     return JsonResponse({
         "success": True,
         "message": "Product added to cart.",
-        "cart_item_id": cart_item.id,
-        "quantity": cart_item.quantity
+        "cart_item_id": cart_item_id,
+        "quantity": quantity
     })
     
 """Remove Product from Cart"""
@@ -734,8 +1288,8 @@ def remove_from_cart(request, cart_item_id: int):
     """
     Remove a product from the cart.
     """
-    cart_item = get_object_or_404(CartItem, id=cart_item_id, cart__user=request.user)
-    cart_item.delete()
+    if not cart_store.remove_item(request.user.id, cart_item_id):
+        return JsonResponse({"success": False, "message": "Cart item not found."}, status=404)
 
     return JsonResponse({"success": True, "message": "Item removed from cart."})
 
@@ -756,6 +1310,8 @@ def create_category(request, payload: CategorySchema, file: Optional[UploadedFil
         category_name=payload.category_name,
         category_image=save_path  # Save S3 URL if file exists
     )
+    if save_path:
+        queue_renditions(category)
 
     return JsonResponse({
         "success": True,
@@ -770,17 +1326,27 @@ def get_all_categories(request):
     """
     Retrieve all categories.
     """
-    categories = Category.objects.all()
-    category_list = [
-        {
-            "id": category.id,
-            "category_name": category.category_name,
-            "category_image": default_storage.url(str(category.category_image)) if category.category_image else None,
-            "created_at": category.created_at,
-        }
-        for category in categories
-    ]
-    return JsonResponse({"success": True, "data": category_list})
+    # Served from worker memory, so the ETag keys on the category version alone
+    table = category_table()
+    etag = catalog_etag(f"categories:v{table['version']}")
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    category_list = resolve_document_images(
+        [
+            {
+                "id": category["id"],
+                "category_name": category["category_name"],
+                "category_image": category["category_image"],
+                "category_image_variants": category["category_image_renditions"],
+                "created_at": category["created_at"],
+            }
+            for category in table["rows"]
+        ],
+        field="category_image",
+    )
+    return catalog_response({"success": True, "data": category_list}, etag)
 
 """Get Category By ID"""
 @api.get("/categories/{category_id}", tags=["categories"])
@@ -788,19 +1354,21 @@ def get_category_by_id(request, category_id: int):
     """
     Retrieve a category by its ID.
     """
-    category = get_object_or_404(Category, id=category_id)
+    category = get_category(category_id=category_id)
+
+    # Copy: the cached row is shared by every request in this worker
+    category_data = {
+        "id": category["id"],
+        "category_name": category["category_name"],
+        "category_image": category["category_image"],
+        "category_image_variants": category["category_image_renditions"],
+        "slug": category["slug"],
+        "created_at": category["created_at"],
+        "updated_at": category["updated_at"],
+    }
+    resolve_document_images([category_data], field="category_image")
 
-    return JsonResponse({
-        "success": True,
-        "data": {
-            "id": category.id,
-            "category_name": category.category_name,
-            "category_image": default_storage.url(str(category.category_image)) if category.category_image else None,
-            "slug": category.slug,
-            "created_at": category.created_at,
-            "updated_at": category.updated_at,
-        }
-    })
+    return JsonResponse({"success": True, "data": category_data})
 
 
 
@@ -821,6 +1389,8 @@ def update_category(request, category_id: int, payload: CategorySchema, file: Op
 
     category.category_name = payload.category_name
     category.save()
+    if file:
+        queue_renditions(category)
 
     return JsonResponse({"success": True, "message": "Category updated successfully"})
 